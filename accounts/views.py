@@ -3,10 +3,11 @@ from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from products.models import Order, Product
+from products.models import ArchivedOrder, Order, Product
 from .models import Profile
 from products.views import Cart 
 from vendors.models import Vendor
+from core.pagination import paginate
 # If you have an Order model, import it
 # from orders.models import Order
 
@@ -129,6 +130,20 @@ def edit_profile_view(request):
 
 @login_required
 def my_orders(request):
-    orders = Order.objects.filter(buyer=request.user).order_by("-created_at")
-    
-    return render(request, "accounts/my_orders.html", {"orders": orders})
+    # orders moved to the archive are listed separately under ?archived=1
+    archived = request.GET.get("archived") == "1"
+    model = ArchivedOrder if archived else Order
+    # one query for the page of orders and one for all their items with
+    # products and line totals, however long the buyer's history is
+    orders = paginate(
+        request,
+        model.objects.filter(buyer=request.user).with_items(),
+        ordering=("-created_at", "-id"),
+    )
+    profile = Profile.objects.filter(user=request.user).first()
+
+    return render(request, "accounts/my_orders.html", {
+        "orders": orders,
+        "archived": archived,
+        "profile": profile,
+    })
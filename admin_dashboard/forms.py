@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from products.forms import ProductStockForm
 from products.models import Product
 from vendors.models import Vendor
 
@@ -18,10 +19,10 @@ class UserCreateForm(UserCreationForm):
         fields = ('username', 'email', 'is_staff', 'is_superuser', 'vendor', 'password1', 'password2')
 
 
-class ProductApprovalForm(forms.ModelForm):
+class ProductApprovalForm(ProductStockForm):
     class Meta:
         model = Product
-        fields = ('name', 'category', 'price', 'vendor', 'description', 'is_approved')
+        fields = ('name', 'category', 'price', 'stock', 'vendor', 'description', 'is_approved')
 
 
 class VendorApprovalForm(forms.ModelForm):
@@ -0,0 +1,18 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.jobs import job
+
+from .models import ActivityLog
+
+
+@job('admin_dashboard.log_activity', atomic=True)
+def log_activity(user_id, action, at):
+    entry = ActivityLog.objects.create(user_id=user_id, action=action)
+    # keep the time of the action rather than the time the worker got to it
+    ActivityLog.objects.filter(pk=entry.pk).update(timestamp=parse_datetime(at))
+
+
+def record_activity(user, action):
+    """Queue an ActivityLog entry for ``user``'s ``action`` instead of writing it in the request."""
+    log_activity.enqueue(user_id=user.pk, action=action, at=timezone.now().isoformat())
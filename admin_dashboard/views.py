@@ -11,16 +11,23 @@ from django.conf import settings
 import json
 
 # Import assumed project models
-from products.models import Product, Order, OrderItem, Payment
+from products.archive import archive_totals
+from products.models import Category, Product, Order, OrderItem, Payment
+from products.services import InvalidTransition, transition_order
 from django.contrib.auth import get_user_model
+from .jobs import record_activity
 from .models import ActivityLog
 from vendors.models import Vendor
 from .forms import UserCreateForm, ProductApprovalForm, VendorApprovalForm
 from django.views.decorators.http import require_POST
 from django.views.decorators.http import require_http_methods
+from core.pagination import paginate
 
 User = get_user_model()
 
+# Rows per page on the admin list views
+ADMIN_PAGE_SIZE = 50
+
 
 @staff_member_required
 def dashboard(request):
@@ -29,20 +36,25 @@ def dashboard(request):
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
     total_users = User.objects.filter(is_active=True).count()
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
+    # product totals come from the maintained per-category counters
+    category_totals = Category.objects.aggregate(total=Sum('product_count'), approved=Sum('approved_count'))
+    total_products = category_totals['total'] or 0
+    # orders per status in one grouped query over the (status, created_at) index
+    status_counts = dict(Order.objects.values_list('status').annotate(count=Count('id')).order_by())
+    # archived orders are all delivered; their totals are cached between archive runs
+    archived = archive_totals()
+    status_counts[Order.DELIVERED] = status_counts.get(Order.DELIVERED, 0) + archived['count']
+    total_orders = sum(status_counts.values())
     # total revenue from paid orders
     total_revenue = (
-        Order.objects.filter(is_paid=True).aggregate(total=Sum('total_amount'))['total'] or 0
-    )
+        Order.objects.filter(status__in=(Order.PAID, Order.DELIVERED))
+        .aggregate(total=Sum('total_amount'))['total'] or 0
+    ) + (archived['revenue'] or 0)
 
     orders_today = Order.objects.filter(created_at__gte=today_start).count()
-    pending_orders = Order.objects.filter(is_paid=False).count()
-    # Product model may or may not have `stock` field; handle gracefully
-    try:
-        low_stock = Product.objects.filter(stock__lte=5).count()
-    except Exception:
-        low_stock = 0
+    pending_orders = status_counts.get(Order.PENDING, 0)
+    # products with stock tracking that are nearly sold out
+    low_stock = Product.objects.filter(stock__lte=5).count()
 
     # Recent activity & recent orders/users
     # prefetch order items with product and vendor to minimize queries
@@ -63,14 +75,6 @@ def dashboard(request):
         else:
             user_name = 'N/A'
 
-        # derive status from available flags
-        if getattr(o, 'is_completed', False):
-            status = 'delivered'
-        elif getattr(o, 'is_paid', False):
-            status = 'paid'
-        else:
-            status = 'pending'
-
         # collect product names and vendor names from order items
         items_list = []
         product_names = []
@@ -93,7 +97,7 @@ def dashboard(request):
             'id': o.id,
             'user_name': user_name,
             'total_amount': getattr(o, 'total_amount', 0),
-            'status': status,
+            'status': o.status,
             'items': items_list,
             'product_list': product_names,
             'vendor_list': vendor_names,
@@ -114,14 +118,16 @@ def dashboard(request):
     # monthly revenue — simple placeholder (can be enhanced)
     monthly = Order.objects.filter(created_at__gte=six_months_ago).values('created_at').annotate(total=Sum('total_amount'))
 
-    # Product category distribution — Product.category is a CharField here
-    category_qs = Product.objects.values('category').annotate(count=Count('id')).order_by('-count')
+    # Product category distribution, read from the category counters
+    category_qs = [
+        {'category': c.name, 'count': c.product_count}
+        for c in Category.objects.order_by('-product_count')
+    ]
 
-    # Order status distribution derived from flags
+    # Order status distribution, from the grouped counts above
     status_qs = [
-        {'status': 'pending', 'count': Order.objects.filter(is_paid=False).count()},
-        {'status': 'paid', 'count': Order.objects.filter(is_paid=True, is_completed=False).count()},
-        {'status': 'delivered', 'count': Order.objects.filter(is_completed=True).count()},
+        {'status': status, 'count': status_counts.get(status, 0)}
+        for status, _label in Order.STATUS_CHOICES
     ]
 
     # Admin activity
@@ -133,10 +139,7 @@ def dashboard(request):
     except Exception:
         pending_vendor_count = 0
 
-    try:
-        pending_product_count = Product.objects.filter(is_approved=False).count()
-    except Exception:
-        pending_product_count = 0
+    pending_product_count = total_products - (category_totals['approved'] or 0)
 
     # Fetch small lists for quick actions
     try:
@@ -180,30 +183,35 @@ def dashboard(request):
 
 @staff_member_required
 def products_view(request):
-    products = Product.objects.all().order_by('-id')
+    products = paginate(request, Product.objects.all(), ordering=('-id',), per_page=ADMIN_PAGE_SIZE)
     return render(request, 'admin_dashboard/products.html', {'products': products, 'filter': 'all'})
 
 
 @staff_member_required
 def orders_view(request):
-    orders = Order.objects.select_related('buyer').all().order_by('-created_at')
+    page = paginate(
+        request,
+        Order.objects.select_related('buyer'),
+        ordering=('-created_at', '-id'),
+        per_page=ADMIN_PAGE_SIZE,
+    )
     # normalize to simple dicts for template safety
     orders_list = []
-    for o in orders:
+    for o in page:
         buyer_name = getattr(o.buyer, 'username', str(o.buyer)) if hasattr(o, 'buyer') else 'N/A'
         orders_list.append({
             'id': o.id,
             'buyer_name': buyer_name,
             'total_amount': getattr(o, 'total_amount', 0),
-            'status': ('delivered' if getattr(o, 'is_completed', False) else ('paid' if getattr(o, 'is_paid', False) else 'pending')),
+            'status': o.status,
             'created_at': getattr(o, 'created_at', None),
         })
-    return render(request, 'admin_dashboard/orders.html', {'orders': orders_list})
+    return render(request, 'admin_dashboard/orders.html', {'orders': orders_list, 'page': page})
 
 
 @staff_member_required
 def users_view(request):
-    users = User.objects.order_by('-date_joined')
+    users = paginate(request, User.objects.all(), ordering=('-date_joined', '-id'), per_page=ADMIN_PAGE_SIZE)
     return render(request, 'admin_dashboard/users.html', {'users': users})
 
 
@@ -211,7 +219,12 @@ def users_view(request):
 def payments_view(request):
     payments = []
     try:
-        payments = Payment.objects.select_related('order', 'order__buyer').order_by('-created_at')
+        payments = paginate(
+            request,
+            Payment.objects.select_related('order', 'order__buyer'),
+            ordering=('-created_at', '-id'),
+            per_page=ADMIN_PAGE_SIZE,
+        )
     except Exception:
         payments = []
 
@@ -242,7 +255,7 @@ def delete_vendor(request, vendor_id):
         pass
 
     v.delete()
-    ActivityLog.objects.create(user=request.user, action=f"Deleted vendor {username} and deactivated user")
+    record_activity(request.user, f"Deleted vendor {username} and deactivated user")
     messages.success(request, f'Vendor {username} deleted and user deactivated.')
     return redirect(reverse('admin_dashboard:vendors'))
 
@@ -260,7 +273,7 @@ def delete_order(request, order_id):
 
     order = get_object_or_404(Order, id=order_id)
     # Log before deleting to preserve info
-    ActivityLog.objects.create(user=request.user, action=f"Deleted order #{order.id}")
+    record_activity(request.user, f"Deleted order #{order.id}")
     order.delete()
     messages.success(request, f'Order #{order_id} deleted.')
     return redirect(reverse('admin_dashboard:home'))
@@ -284,7 +297,7 @@ def create_user(request):
                     profile.save()
                 except Exception:
                     pass
-            ActivityLog.objects.create(user=request.user, action=f"Created user {user.username}")
+            record_activity(request.user, f"Created user {user.username}")
             messages.success(request, f'User {user.username} created.')
             return redirect(reverse('admin_dashboard:home'))
         else:
@@ -303,13 +316,13 @@ def approve_vendor(request, vendor_id):
     if action == 'approve':
         v.is_approved = True
         v.save()
-        ActivityLog.objects.create(user=request.user, action=f"Approved vendor {v.user.username}")
+        record_activity(request.user, f"Approved vendor {v.user.username}")
         messages.success(request, f'Vendor {v.user.username} approved.')
     elif action == 'reject':
         # rejecting: set not approved and optionally notify — for now just mark and log
         v.is_approved = False
         v.save()
-        ActivityLog.objects.create(user=request.user, action=f"Rejected vendor {v.user.username}")
+        record_activity(request.user, f"Rejected vendor {v.user.username}")
         messages.success(request, f'Vendor {v.user.username} rejected.')
     else:
         messages.error(request, 'Unknown action.')
@@ -337,7 +350,7 @@ def reject_vendor(request, vendor_id):
     # delete vendor entry
     v.delete()
 
-    ActivityLog.objects.create(user=request.user, action=f"Rejected vendor {username} (vendor record removed)")
+    record_activity(request.user, f"Rejected vendor {username} (vendor record removed)")
     messages.success(request, f'Vendor {username} rejected and removed.')
     return redirect(reverse('admin_dashboard:home'))
 
@@ -349,13 +362,13 @@ def approve_product(request, product_id):
     action = request.POST.get('action')
     if action == 'approve':
         p.is_approved = True
-        p.save()
-        ActivityLog.objects.create(user=request.user, action=f"Approved product {p.name} (#{p.id})")
+        p.save(update_fields=['is_approved'])
+        record_activity(request.user, f"Approved product {p.name} (#{p.id})")
         messages.success(request, f'Product {p.name} approved.')
     elif action == 'disable':
         p.is_approved = False
-        p.save()
-        ActivityLog.objects.create(user=request.user, action=f"Disabled product {p.name} (#{p.id})")
+        p.save(update_fields=['is_approved'])
+        record_activity(request.user, f"Disabled product {p.name} (#{p.id})")
         messages.success(request, f'Product {p.name} disabled.')
     else:
         messages.error(request, 'Unknown action.')
@@ -371,7 +384,7 @@ def edit_product(request, product_id):
         form = ProductApprovalForm(request.POST, instance=p)
         if form.is_valid():
             form.save()
-            ActivityLog.objects.create(user=request.user, action=f"Edited product {p.name} (#{p.id})")
+            record_activity(request.user, f"Edited product {p.name} (#{p.id})")
             messages.success(request, f'Product {p.name} updated.')
             return redirect(reverse('admin_dashboard:products'))
         else:
@@ -387,27 +400,18 @@ def edit_product(request, product_id):
 def change_order_status(request, order_id):
     new_status = request.POST.get('status')
     order = get_object_or_404(Order, id=order_id)
-    # simple mapping: 'pending','paid','delivered'
-    if new_status == 'paid':
-        order.is_paid = True
-        order.is_completed = False
-        order.save()
-        ActivityLog.objects.create(user=request.user, action=f"Marked order #{order.id} as paid")
-        messages.success(request, f'Order #{order.id} marked as paid.')
-    elif new_status == 'delivered':
-        order.is_paid = True
-        order.is_completed = True
-        order.save()
-        ActivityLog.objects.create(user=request.user, action=f"Marked order #{order.id} as delivered")
-        messages.success(request, f'Order #{order.id} marked as delivered.')
-    elif new_status == 'pending':
-        order.is_paid = False
-        order.is_completed = False
-        order.save()
-        ActivityLog.objects.create(user=request.user, action=f"Marked order #{order.id} as pending")
-        messages.success(request, f'Order #{order.id} marked as pending.')
-    else:
+    if new_status not in dict(Order.STATUS_CHOICES):
         messages.error(request, 'Unknown status')
+    elif new_status == order.status:
+        messages.info(request, f'Order #{order.id} is already {order.get_status_display().lower()}.')
+    else:
+        try:
+            transition_order(order, new_status, by=request.user)
+        except InvalidTransition:
+            messages.error(request, f'Order #{order.id} cannot go from {order.get_status_display().lower()} to {new_status}.')
+        else:
+            record_activity(request.user, f"Marked order #{order.id} as {new_status}")
+            messages.success(request, f'Order #{order.id} marked as {new_status}.')
 
     return redirect(reverse('admin_dashboard:home'))
 
@@ -420,12 +424,12 @@ def toggle_user_active(request, user_id):
     if action == 'deactivate':
         user.is_active = False
         user.save()
-        ActivityLog.objects.create(user=request.user, action=f"Deactivated user {user.username}")
+        record_activity(request.user, f"Deactivated user {user.username}")
         messages.success(request, f'User {user.username} deactivated.')
     elif action == 'activate':
         user.is_active = True
         user.save()
-        ActivityLog.objects.create(user=request.user, action=f"Activated user {user.username}")
+        record_activity(request.user, f"Activated user {user.username}")
         messages.success(request, f'User {user.username} activated.')
     else:
         messages.error(request, 'Unknown action')
@@ -1,3 +1,19 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at',)
+    actions = ['retry']
+
+    @admin.action(description="Queue selected jobs again")
+    def retry(self, request, queryset):
+        queued = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), locked_until=None,
+        )
+        self.message_user(request, f"{queued} job(s) queued again.")
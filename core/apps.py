@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_sqlite_connection
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='core.configure_sqlite_connection')
+        # register the background jobs every app defines in its jobs.py
+        autodiscover_modules('jobs')
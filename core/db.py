@@ -0,0 +1,34 @@
+from django.conf import settings
+
+# Set by enable_serve_pragmas() in the WSGI entry point
+_serving = False
+
+
+def enable_serve_pragmas():
+    """Also apply SQLITE_SERVE_PRAGMAS to connections opened from now on.
+
+    Called from openbazar/wsgi.py, so only a process serving requests
+    switches the database to WAL, not every management command.
+    """
+    global _serving
+    _serving = True
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply the configured PRAGMAs to a freshly opened SQLite connection.
+
+    Connected to ``connection_created`` in CoreConfig.ready(). Other database
+    backends are left alone. The pragma names and values come from settings,
+    never from a request, so they are interpolated directly (SQLite does not
+    accept parameters in PRAGMA statements).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if _serving:
+        pragmas.update(getattr(settings, 'SQLITE_SERVE_PRAGMAS', {}))
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
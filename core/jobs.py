@@ -0,0 +1,151 @@
+import datetime
+import functools
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# How long (seconds) a claimed job belongs to its worker before others may retake it
+JOB_LEASE = 300
+
+# Retry delay (seconds) after the first failure; doubles with every attempt up to JOB_BACKOFF_MAX
+JOB_BACKOFF_BASE = 10
+JOB_BACKOFF_MAX = 60 * 60
+
+# Due jobs looked at per claim; the first one not taken by another worker wins
+CLAIM_BATCH = 10
+
+# name -> (function, max_attempts, atomic)
+_registry = {}
+
+
+# ======================
+# REGISTRY
+# ======================
+def job(name, max_attempts=5, atomic=False):
+    """Register a function as a background job under ``name``.
+
+    The function is called with the keyword arguments given to enqueue(), so
+    they must be JSON serializable. It should be safe to run more than once:
+    a job is retried after a failure or when its worker disappears mid-run.
+    With ``atomic=True`` it runs inside one transaction; leave that off for
+    jobs doing slow work (files, network), since on SQLite an open write
+    transaction holds the database-wide write lock until it ends. The
+    decorated function gains ``enqueue(**kwargs)``.
+    """
+    def decorator(func):
+        _registry[name] = (func, max_attempts, atomic)
+        func.enqueue = functools.partial(enqueue, name)
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, **kwargs):
+    """Queue job ``name`` with ``kwargs``, to run after ``delay`` (a timedelta) if given.
+
+    The row is written on the current connection, so inside a transaction the
+    job is only visible to workers once that transaction commits, and is
+    dropped with it on rollback.
+    """
+    _func, max_attempts, _atomic = _registry[name]
+    run_at = timezone.now() + (delay or datetime.timedelta())
+    return Job.objects.create(name=name, payload=kwargs, max_attempts=max_attempts, run_at=run_at)
+
+
+# ======================
+# RUNNING
+# ======================
+def _lease():
+    return datetime.timedelta(seconds=getattr(settings, 'JOB_LEASE', JOB_LEASE))
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed ``attempts`` times."""
+    base = getattr(settings, 'JOB_BACKOFF_BASE', JOB_BACKOFF_BASE)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'JOB_BACKOFF_MAX', JOB_BACKOFF_MAX))
+    # jitter, so jobs that failed together do not all retry together
+    return delay * random.uniform(0.75, 1.0)
+
+
+def claim(worker):
+    """Take the lease on the next due job for ``worker`` and return it, or None.
+
+    Due jobs are queued ones whose run_at has passed and running ones whose
+    lease ran out. Each candidate is taken with a conditional UPDATE that
+    only matches while it is still claimable, so two workers can never both
+    get the same job.
+    """
+    now = timezone.now()
+    claimable = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lte=now)
+    candidates = Job.objects.filter(claimable).order_by('run_at', 'id').values_list('id', flat=True)[:CLAIM_BATCH]
+    for job_id in candidates:
+        taken = Job.objects.filter(claimable, pk=job_id).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_until=now + _lease(),
+            attempts=F('attempts') + 1,
+        )
+        if taken:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job, worker):
+    """Run a claimed job and record the outcome.
+
+    Success deletes the job. A failure puts it back in the queue after
+    backoff(), or marks it failed once it has used up its attempts. Both are
+    only written while ``worker`` still holds the lease.
+    """
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker)
+    entry = _registry.get(job.name)
+    if entry is None:
+        mine.update(status=Job.FAILED, locked_until=None, last_error=f"Unknown job {job.name!r}")
+        return False
+    if job.attempts > job.max_attempts:
+        # its worker kept disappearing (the lease expired on the last attempt)
+        mine.update(status=Job.FAILED, locked_until=None, last_error=job.last_error or "Lease expired")
+        return False
+
+    func, _max_attempts, atomic = entry
+    try:
+        if atomic:
+            with transaction.atomic():
+                func(**job.payload)
+        else:
+            func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s/%s)", job.name, job.pk, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            mine.update(status=Job.FAILED, locked_until=None, last_error=error)
+        else:
+            mine.update(
+                status=Job.QUEUED,
+                locked_until=None,
+                run_at=timezone.now() + datetime.timedelta(seconds=backoff(job.attempts)),
+                last_error=error,
+            )
+        return False
+    mine.delete()
+    return True
+
+
+def run_pending(worker, limit=None):
+    """Claim and run due jobs until none are left (or ``limit`` ran). Returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run_job(job, worker)
+        ran += 1
+    return ran
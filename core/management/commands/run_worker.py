@@ -0,0 +1,58 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.jobs import claim, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (image variants, activity log, ...) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Jobs run at the same time (threads).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        counts = {'done': 0, 'failed': 0}
+        lock = threading.Lock()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        def work(number):
+            worker = f'{prefix}:{number}'
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    job = claim(worker)
+                    if job is None:
+                        if options['burst']:
+                            break
+                        stop.wait(options['poll_interval'])
+                        continue
+                    succeeded = run_job(job, worker)
+                    with lock:
+                        counts['done' if succeeded else 'failed'] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=(number,), name=f'job-worker-{number}')
+            for number in range(max(options['concurrency'], 1))
+        ]
+        self.stdout.write(f"Worker {prefix} running {len(threads)} thread(s).")
+        for thread in threads:
+            thread.start()
+        # join with a timeout so the main thread keeps handling signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {counts['done']} job(s), {counts['failed']} failed."))
@@ -1,3 +1,43 @@
 from django.db import models
 
-# Create your models here.
+
+# ======================
+# JOBS
+# ======================
+class Job(models.Model):
+    """A unit of background work, run by ``manage.py run_worker`` (see core/jobs.py).
+
+    Queued jobs become claimable at ``run_at``. A worker claims one by taking a
+    lease until ``locked_until``; if the worker dies the lease runs out and
+    the job is claimed again. Finished jobs are deleted, failed ones are kept
+    with their last error.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # the claim query: next due job of a status
+            models.Index(fields=['status', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,203 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import QueryDict
+
+
+# ======================
+# CURSORS
+# ======================
+class ExactJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds; cursors need the
+    # exact stored value or rows sharing a millisecond would be skipped.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, reverse=False):
+    """Pack the ordering values of a boundary row into an opaque URL-safe token."""
+    payload = json.dumps({'v': list(values), 'r': int(reverse)}, cls=ExactJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Unpack a cursor token. Returns (values, reverse) or (None, False) if invalid."""
+    if not token:
+        return None, False
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return list(data['v']), bool(data.get('r'))
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None, False
+
+
+def _parse_ordering(ordering):
+    return [(key.lstrip('-'), key.startswith('-')) for key in ordering]
+
+
+def _model_field(model, path):
+    """The model field behind an ordering key such as ``created_at`` or
+    ``product__name``, or None (e.g. for an annotation)."""
+    field = None
+    for part in path.split('__'):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+def _clean_values(model, fields, values):
+    """Convert decoded cursor values to the Python types of their fields.
+
+    Returns None if any value does not fit its field, so a tampered cursor
+    falls back to the first page instead of failing the query.
+    """
+    cleaned = []
+    for (path, _desc), value in zip(fields, values):
+        if value is None:
+            return None
+        field = _model_field(model, path)
+        if field is not None:
+            try:
+                value = field.to_python(value)
+            except (ValidationError, ValueError, TypeError):
+                return None
+        cleaned.append(value)
+    return cleaned
+
+
+def _row_values(obj, fields):
+    values = []
+    for field, _desc in fields:
+        if isinstance(obj, dict):
+            values.append(obj[field])
+            continue
+        value = obj
+        for part in field.split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+def _seek_filter(fields, values, backwards):
+    """Build the WHERE clause selecting rows strictly after ``values``.
+
+    For an ordering (a, b) this is ``a > x OR (a = x AND b > y)``, with the
+    comparison flipped for descending keys and again when paging backwards.
+    """
+    condition = Q()
+    for i, (field, desc) in enumerate(fields):
+        lookup = 'lt' if desc != backwards else 'gt'
+        clause = Q(**{f'{field}__{lookup}': values[i]})
+        for j in range(i):
+            clause &= Q(**{fields[j][0]: values[j]})
+        condition |= clause
+    return condition
+
+
+# ======================
+# PAGE
+# ======================
+class CursorPage:
+    """A single page of keyset-paginated results.
+
+    Behaves like a list in templates and exposes ``next_url``/``previous_url``
+    for the navigation links. No COUNT query is ever issued.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, request=None, cursor_param='cursor'):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.request = request
+        self.cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy() if self.request is not None else QueryDict(mutable=True)
+        params[self.cursor_param] = cursor
+        return '?' + params.urlencode()
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor)
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor)
+
+
+def paginate(request, queryset, ordering=('-id',), per_page=20, cursor_param='cursor'):
+    """Return a CursorPage of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end with a unique column (normally ``id``) so that every
+    row has a distinct position. Each page is fetched with a seek predicate on
+    the ordering columns plus ``LIMIT per_page + 1``, so page N costs the same
+    as page 1.
+    """
+    fields = _parse_ordering(ordering)
+    token = request.GET.get(cursor_param) if request is not None else None
+    values, backwards = decode_cursor(token)
+    if values is not None and len(values) == len(fields):
+        values = _clean_values(queryset.model, fields, values)
+    else:
+        values = None
+    if values is None:
+        backwards = False
+
+    if backwards:
+        order_by = [f'{"" if desc else "-"}{field}' for field, desc in fields]
+    else:
+        order_by = list(ordering)
+
+    qs = queryset.order_by(*order_by)
+    if values is not None:
+        qs = qs.filter(_seek_filter(fields, values, backwards))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(_row_values(rows[-1], fields))
+        if (has_more and backwards) or (values is not None and not backwards):
+            previous_cursor = encode_cursor(_row_values(rows[0], fields), reverse=True)
+
+    return CursorPage(rows, next_cursor, previous_cursor, request=request, cursor_param=cursor_param)
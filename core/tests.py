@@ -1,3 +1,31 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .pagination import encode_cursor, paginate
+
+
+class TamperedCursorTests(TestCase):
+    """A cursor that decodes but holds values of the wrong type is ignored."""
+
+    def setUp(self):
+        for i in range(5):
+            User.objects.create_user(f'user{i}')
+        self.factory = RequestFactory()
+
+    def _page(self, token, ordering):
+        request = self.factory.get('/', {'cursor': token})
+        return paginate(request, User.objects.all(), ordering=ordering, per_page=2)
+
+    def test_bad_values_fall_back_to_first_page(self):
+        first = [user.pk for user in self._page('', ('-date_joined', '-id'))]
+        for values in (['not a date', 1], ['2024-01-01T00:00:00+00:00', 'x'], [None, 3], [[1], {}]):
+            with self.subTest(values=values):
+                page = self._page(encode_cursor(values), ('-date_joined', '-id'))
+                self.assertEqual([user.pk for user in page], first)
+                self.assertFalse(page.has_previous)
+
+    def test_valid_cursor_still_seeks(self):
+        first = self._page('', ('-id',))
+        second = self._page(first.next_cursor, ('-id',))
+        self.assertEqual(len(second), 2)
+        self.assertLess(second[0].pk, first[-1].pk)
@@ -1,4 +1,19 @@
 from django.shortcuts import render
+from django.views.static import serve
+
+from products.storage import DIGEST_NAME_RE
+
+# One year: digest-named media never changes, so browsers need not revalidate
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
 
 def home(request):
     return render(request, 'core/home.html')
+
+
+def serve_media(request, path, document_root=None):
+    """Development media server that marks content-addressed files immutable."""
+    response = serve(request, path, document_root=document_root)
+    if DIGEST_NAME_RE.search(path):
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
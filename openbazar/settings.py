@@ -82,9 +82,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # take the write lock when a transaction starts, so a transaction
+            # that reads then writes waits its turn instead of failing with
+            # "database is locked" when it tries to upgrade its lock
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMAs run on every new SQLite connection (see core/db.py). Set to {} to
+# keep SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,          # ms, matches OPTIONS['timeout']
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,           # negative means KiB: about 20 MB of page cache
+    'temp_store': 'memory',
+}
+
+# Added to SQLITE_PRAGMAS only once the WSGI application is loaded (runserver,
+# gunicorn). WAL lets readers carry on while a write is in progress; with WAL,
+# synchronous=NORMAL is still crash safe and only syncs at checkpoints. WAL is
+# recorded in the database file itself, so applying it at serve time only
+# keeps management commands (migrate, tests, cron jobs) from switching the
+# committed db.sqlite3 over. For a served database, use an untracked copy.
+SQLITE_SERVE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -124,6 +151,43 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Caches: the default local-memory cache is per process, so anything every
+# worker process must agree on lives in a file-based cache instead: live carts
+# in 'carts', and small shared values (the catalog generation, archive
+# totals) in 'shared'. Point these at Redis/Memcached when running on more
+# than one host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'carts',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'shared',
+    },
+}
+SHARED_CACHE_ALIAS = 'shared'
+
+# Carts: 'cache' keeps live carts in CART_CACHE_ALIAS and writes them back in
+# batches (every CART_FLUSH_INTERVAL, at checkout, and by `manage.py
+# flush_carts`), saving SQLite a write per change. Each change holds a
+# per-cart file lock in CART_LOCK_DIR, so concurrent changes to one cart never
+# lose each other; the lock, like the file cache, is local to this host, so
+# use 'database' when the web processes run on several hosts. 'database'
+# writes every change to Cart/CartItem with one atomic upsert.
+CART_STORE = 'cache'
+CART_CACHE_ALIAS = 'carts'
+CART_LOCK_DIR = BASE_DIR / '.cache' / 'cart-locks'
+
+# Background jobs (core/jobs.py) are kept in the database and run by
+# `manage.py run_worker --concurrency N`. A job's lease must outlast its run.
+JOB_LEASE = 300
+JOB_BACKOFF_BASE = 10
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 
 ESEWA_MERCHANT_CODE = "epay_payment"  # Test merchant code
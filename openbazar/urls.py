@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from core.views import home
+from products.api import product_feed
 
 
 urlpatterns = [
@@ -29,9 +30,16 @@ urlpatterns = [
     path('edit-profile/', home, name='edit_profile'),  # Edit profile page
     path('products/', include('products.urls', namespace='products')),
     path('vendors/', include('vendors.urls')),
+    path('api/products/', product_feed, name='product_feed'),
 
 ]
 from django.conf import settings
-from django.conf.urls.static import static
+from django.urls import re_path
+from core.views import serve_media
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.DEBUG:
+    # Like static(), but content-addressed product images get far-future caching
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]
\ No newline at end of file
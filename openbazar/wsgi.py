@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'openbazar.settings')
 
 application = get_wsgi_application()
+
+# switch SQLite to WAL for serving only (see SQLITE_SERVE_PRAGMAS)
+from core.db import enable_serve_pragmas  # noqa: E402
+
+enable_serve_pragmas()
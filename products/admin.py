@@ -1,5 +1,29 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Product, Cart, CartItem
+from .forms import ProductStockForm
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Category, Order, OrderItem, OrderStatusChange, Product, Cart, CartItem,
+)
+
+# -------------------
+# Category Admin
+# -------------------
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'sort_order', 'product_count', 'approved_count')
+    list_editable = ('sort_order',)
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('product_count', 'approved_count')
+
+    # Product.category references the name itself, so a category keeps the
+    # name it was created with (renaming one with products breaks the FK)
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('name', *self.readonly_fields)
+        return self.readonly_fields
+
+    def get_prepopulated_fields(self, request, obj=None):
+        return {} if obj is not None else self.prepopulated_fields
+
 
 # -------------------
 # Product Admin
@@ -8,8 +32,9 @@ from .models import Order, OrderItem, Product, Cart, CartItem
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'vendor', 'image')
     list_filter = ('category',)
-    search_fields = ('name', 'category')
-    fields = ('name', 'category', 'price', 'vendor', 'image', 'description')
+    search_fields = ('name', 'category__name')
+    fields = ('name', 'category', 'price', 'stock', 'vendor', 'image', 'description')
+    form = ProductStockForm
     
 
 # -------------------
@@ -20,11 +45,27 @@ class CartItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('product', 'quantity', 'total_price')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_display()
+
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_items', 'total_price')
+    list_select_related = ('user',)
     inlines = [CartItemInline]
 
+    def get_queryset(self, request):
+        # totals are summed in the changelist query itself
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description='Total items', ordering='items_count')
+    def total_items(self, obj):
+        return obj.total_items
+
+    @admin.display(description='Total price', ordering='items_total')
+    def total_price(self, obj):
+        return obj.total_price
+
 # -------------------
 # CartItem Admin (optional if you want a separate view)
 # -------------------
@@ -43,14 +84,56 @@ class CartItemAdmin(admin.ModelAdmin):
 # -------------------
 # Order & OrderItem Admin
 # -------------------
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    can_delete = False
+    fields = ('from_status', 'to_status', 'changed_by', 'changed_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'buyer', 'total_amount', 'payment_method', 'is_paid', 'created_at')
-    list_filter = ('payment_method', 'is_paid')
+    list_display = ('id', 'buyer', 'total_amount', 'payment_method', 'status', 'created_at')
+    list_filter = ('payment_method', 'status')
     search_fields = ('buyer__username',)
     ordering = ('-created_at',)
+    # status only moves through services.transition_order, which keeps the history
+    readonly_fields = ('status',)
+    inlines = [OrderStatusChangeInline]
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
     search_fields = ('product__name', 'order__user__username')
+
+# -------------------
+# Order archive (read-only)
+# -------------------
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    fields = ('product', 'vendor', 'quantity', 'price', 'is_completed')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'buyer', 'total_amount', 'payment_method', 'status', 'created_at', 'archived_at')
+    list_filter = ('payment_method',)
+    search_fields = ('=id', 'buyer__username')
+    ordering = ('-created_at',)
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,108 @@
+import datetime
+
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from core.pagination import ExactJSONEncoder
+
+from .images import VARIANT_SIZES, variant_name
+from .models import Product
+
+# Rows fetched from the database per round trip while streaming
+FEED_CHUNK_SIZE = 2000
+
+# Columns a client may ask for with ?fields=
+FEED_FIELDS = (
+    'id', 'name', 'category', 'price', 'vendor', 'description',
+    'image', 'image_variants', 'version', 'updated_at',
+)
+
+# Sent when ?fields= is not given
+DEFAULT_FEED_FIELDS = ('id', 'name', 'category', 'price', 'vendor', 'image', 'updated_at')
+
+
+def _image_urls(request, storage, name, has_variants):
+    if not name:
+        return None
+    urls = {'original': request.build_absolute_uri(storage.url(name))}
+    if has_variants:
+        for size in VARIANT_SIZES:
+            urls[size] = request.build_absolute_uri(storage.url(variant_name(name, size, 'webp')))
+    return urls
+
+
+def _feed_rows(request, queryset, fields):
+    storage = Product._meta.get_field('image').storage
+    columns = {field for field in fields if field != 'image'}
+    if 'image' in fields:
+        columns.update({'image', 'image_variants'})
+    # the ordering columns are always read, the sync position depends on them
+    columns.update({'id', 'updated_at'})
+
+    rows = queryset.values(*columns).iterator(chunk_size=FEED_CHUNK_SIZE)
+    for row in rows:
+        if 'image' in fields:
+            row['image'] = _image_urls(request, storage, row['image'], row['image_variants'])
+        yield {field: row[field] for field in fields}
+
+
+@require_GET
+def product_feed(request):
+    """Stream every approved product as NDJSON (default) or a JSON array.
+
+    ``?since=<ISO datetime>`` only returns products modified after that time,
+    oldest first, so a client can resume from the last ``updated_at`` it saw;
+    adding ``&after=<id>`` of that last row also picks up the rest of the rows
+    stamped with the same time.
+    ``?fields=id,name,price`` limits each record to the listed columns.
+
+    Rows are read with a server-side iterator and written out as they arrive,
+    so memory use does not grow with the size of the catalog.
+    """
+    fields = DEFAULT_FEED_FIELDS
+    if request.GET.get('fields'):
+        fields = tuple(dict.fromkeys(f.strip() for f in request.GET['fields'].split(',') if f.strip()))
+        unknown = [field for field in fields if field not in FEED_FIELDS]
+        if unknown or not fields:
+            return JsonResponse({'error': f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+    queryset = Product.objects.filter(is_approved=True)
+    since = request.GET.get('since')
+    if since:
+        since_at = parse_datetime(since)
+        if since_at is None:
+            return JsonResponse({'error': 'since must be an ISO 8601 datetime'}, status=400)
+        if timezone.is_naive(since_at):
+            since_at = timezone.make_aware(since_at, datetime.timezone.utc)
+        after = request.GET.get('after', '')
+        if after.isdigit():
+            # resume inside a run of rows sharing the same timestamp
+            queryset = queryset.filter(Q(updated_at__gt=since_at) | Q(updated_at=since_at, id__gt=int(after)))
+        else:
+            queryset = queryset.filter(updated_at__gt=since_at)
+    queryset = queryset.order_by('updated_at', 'id')
+
+    # full-precision timestamps, so resuming from the last updated_at seen
+    # does not return that row again
+    encoder = ExactJSONEncoder(separators=(',', ':'))
+    rows = _feed_rows(request, queryset, fields)
+
+    if request.GET.get('format') == 'json':
+        def content():
+            yield '['
+            for i, row in enumerate(rows):
+                yield (',' if i else '') + encoder.encode(row)
+            yield ']'
+        content_type = 'application/json'
+    else:
+        def content():
+            for row in rows:
+                yield encoder.encode(row) + '\n'
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(content(), content_type=content_type)
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.http import Http404
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, CheckoutQuote, Order, OrderItem, OrderStatusChange, Payment,
+)
+
+# Orders moved per transaction
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVE_TOTALS_KEY = 'orders:archive_totals'
+
+
+# ======================
+# LOOKUP
+# ======================
+def find_order(**lookup):
+    """The live Order matching ``lookup`` (e.g. id=..., buyer=...), else its
+    archived copy, else None. Old order ids keep resolving after archival."""
+    order = Order.objects.filter(**lookup).first()
+    if order is None:
+        order = ArchivedOrder.objects.filter(**lookup).first()
+    return order
+
+
+def get_order_or_404(**lookup):
+    order = find_order(**lookup)
+    if order is None:
+        raise Http404("No order matches the given query.")
+    return order
+
+
+def _totals_cache():
+    # shared by every process, so an archive run clears it for all of them
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def archive_totals():
+    """Order count and revenue of the archive, cached until the next archived batch."""
+    totals = _totals_cache().get(ARCHIVE_TOTALS_KEY)
+    if totals is None:
+        totals = ArchivedOrder.objects.aggregate(count=Count('id'), revenue=Sum('total_amount'))
+        _totals_cache().set(ARCHIVE_TOTALS_KEY, totals, 60 * 60)
+    return totals
+
+
+# ======================
+# ARCHIVING
+# ======================
+def archive_orders(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move delivered orders created before ``before`` into the archive tables.
+
+    Works oldest first in batches, each batch in its own transaction: the
+    orders, their items and payments are copied with their ids, the status
+    history is folded into ArchivedOrder.history, and the live rows (with
+    their reservations, quotes and idempotency keys) are deleted. An
+    interrupted run leaves every batch either fully moved or untouched.
+    Returns the number of orders archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Order.objects.filter(status=Order.DELIVERED, created_at__lt=before)
+                .order_by('created_at', 'id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            history = {}
+            for change in OrderStatusChange.objects.filter(order_id__in=ids).order_by('changed_at', 'id'):
+                history.setdefault(change.order_id, []).append(
+                    [change.from_status, change.to_status, change.changed_by_id, change.changed_at.isoformat()]
+                )
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(
+                    id=order.id,
+                    buyer_id=order.buyer_id,
+                    created_at=order.created_at,
+                    total_amount=order.total_amount,
+                    payment_method=order.payment_method,
+                    status=order.status,
+                    history=history.get(order.id, []),
+                )
+                for order in Order.objects.filter(id__in=ids)
+            ])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(
+                    id=item.id,
+                    order_id=item.order_id,
+                    product_id=item.product_id,
+                    vendor_id=item.vendor_id,
+                    quantity=item.quantity,
+                    price=item.price,
+                    is_completed=item.is_completed,
+                )
+                for item in OrderItem.objects.filter(order_id__in=ids)
+            ])
+            ArchivedPayment.objects.bulk_create([
+                ArchivedPayment(
+                    id=payment.id,
+                    order_id=payment.order_id,
+                    payment_method=payment.payment_method,
+                    transaction_id=payment.transaction_id,
+                    amount=payment.amount,
+                    status=payment.status,
+                    created_at=payment.created_at,
+                )
+                for payment in Payment.objects.filter(order_id__in=ids)
+            ])
+
+            # a quote would otherwise outlive its order (SET_NULL)
+            CheckoutQuote.objects.filter(order_id__in=ids).delete()
+            Order.objects.filter(id__in=ids).delete()
+        # after each committed batch, so an interrupted run leaves no stale totals
+        _totals_cache().delete(ARCHIVE_TOTALS_KEY)
+        archived += len(ids)
+
+    return archived
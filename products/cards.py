@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Rendered cards are immutable per (id, version); the timeout only reclaims
+# entries for versions that have since been replaced.
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(product):
+    return f'product-card:{product.pk}:{product.version}'
+
+
+def render_product_cards(products):
+    """Return {product_id: card HTML} for ``products``, rendering only cache misses.
+
+    All cards are fetched with one get_many and the misses stored with one
+    set_many, so a warm catalog page costs a single cache round trip.
+    """
+    keyed = {card_cache_key(product): product for product in products}
+    cards = cache.get_many(list(keyed))
+
+    missing = {}
+    for key, product in keyed.items():
+        if key not in cards:
+            missing[key] = render_to_string('products/_product_card.html', {'product': product})
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+        cards.update(missing)
+
+    return {product.pk: mark_safe(cards[key]) for key, product in keyed.items()}
+
+
+def invalidate_product_card(product):
+    cache.delete(card_cache_key(product))
@@ -0,0 +1,360 @@
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files import locks
+
+from .models import MAX_LINE_QUANTITY, Cart, CartItem, Product
+
+# Where anonymous carts live in the session
+SESSION_CART_KEY = 'cart'
+
+# Cache key holding the ids of users whose cached cart is ahead of the database
+DIRTY_CARTS_KEY = 'carts:dirty'
+
+# How long an untouched cart stays cached
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 14
+
+# Longest time (seconds) cart changes may stay in the cache only
+CART_FLUSH_INTERVAL = 300
+
+
+def _cart_cache():
+    return caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+
+
+def _user_cart_key(user_id):
+    return f'cart:user:{user_id}'
+
+
+@contextmanager
+def _cart_lock(name):
+    """Hold the exclusive lock ``name`` against every thread and process on this host.
+
+    An OS file lock (flock) on CART_LOCK_DIR/<name>.lock, so it covers the
+    file-based and local-memory caches, which are host-local themselves.
+    """
+    directory = Path(getattr(settings, 'CART_LOCK_DIR', Path(tempfile.gettempdir()) / 'cart-locks'))
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f'{name}.lock', 'wb') as handle:
+        locks.lock(handle, locks.LOCK_EX)
+        try:
+            yield
+        finally:
+            locks.unlock(handle)
+
+
+# ======================
+# CART CONTENTS
+# ======================
+class CartLine:
+    """A line of a cart kept outside the database; looks like a CartItem to templates."""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.product_id = product.id
+        self.quantity = quantity
+
+    @property
+    def total_price(self):
+        return self.product.price * self.quantity
+
+
+class CartContents:
+    """The lines of a cart with their products, and its totals."""
+
+    def __init__(self, lines, total_items=None, total_price=None):
+        self.lines = lines
+        self.total_items = total_items if total_items is not None else sum(line.quantity for line in lines)
+        self.total_price = total_price if total_price is not None else sum(line.total_price for line in lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+# ======================
+# STORES
+# ======================
+# Every store keys its lines by product id and offers the same operations, so
+# the cart views do not care where a cart is kept.
+class DatabaseCartStore:
+    """Cart kept in Cart/CartItem; every change is written straight away."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+
+    def contents(self):
+        cart = Cart.objects.for_user(self.user)
+        return CartContents(list(cart.items.all()), cart.total_items, cart.total_price)
+
+    def add(self, product_id, quantity):
+        line = CartItem.objects.add_for_user(self.user, product_id, quantity)
+        return line[1] if line else None
+
+    def merge(self, quantities):
+        for product_id, quantity in quantities.items():
+            self.add(product_id, quantity)
+
+    def update(self, quantities):
+        kept, removed = CartItem.objects.set_quantities(self.user, quantities)
+        return [item.product_id for item in kept], removed
+
+    def remove(self, product_id):
+        deleted, _ = CartItem.objects.filter(cart__user=self.user, product_id=product_id).delete()
+        return bool(deleted)
+
+    def clear(self):
+        CartItem.objects.filter(cart__user=self.user).delete()
+
+    def flush(self, release=False):
+        pass
+
+
+class _MappingCartStore:
+    """Shared logic of the stores holding a plain {product_id: quantity} map."""
+
+    def quantities(self):
+        raise NotImplementedError
+
+    def _save(self, quantities):
+        raise NotImplementedError
+
+    def contents(self):
+        quantities = self.quantities()
+        products = Product.objects.in_bulk(list(quantities))
+        return CartContents([
+            CartLine(products[product_id], quantity)
+            for product_id, quantity in quantities.items()
+            if product_id in products
+        ])
+
+    def add(self, product_id, quantity):
+        if not Product.objects.filter(id=product_id).exists():
+            return None
+        quantities = self.quantities()
+        quantities[product_id] = min(quantities.get(product_id, 0) + quantity, MAX_LINE_QUANTITY)
+        self._save(quantities)
+        return quantities[product_id]
+
+    def merge(self, incoming):
+        quantities = self.quantities()
+        for product_id, quantity in incoming.items():
+            quantities[product_id] = min(quantities.get(product_id, 0) + quantity, MAX_LINE_QUANTITY)
+        self._save(quantities)
+
+    def update(self, changes):
+        quantities = self.quantities()
+        kept, removed = [], []
+        for product_id, quantity in changes.items():
+            if product_id not in quantities:
+                continue
+            if quantity <= 0:
+                del quantities[product_id]
+                removed.append(product_id)
+            else:
+                quantities[product_id] = min(quantity, MAX_LINE_QUANTITY)
+                kept.append(product_id)
+        if kept or removed:
+            self._save(quantities)
+        return kept, removed
+
+    def remove(self, product_id):
+        quantities = self.quantities()
+        if quantities.pop(product_id, None) is None:
+            return False
+        self._save(quantities)
+        return True
+
+    def clear(self):
+        self._save({})
+
+    def flush(self, release=False):
+        pass
+
+
+class SessionCartStore(_MappingCartStore):
+    """Anonymous cart kept in the session; merged into the user's cart on login."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def quantities(self):
+        # JSON-serialized sessions turn the keys into strings
+        return {int(product_id): quantity for product_id, quantity in self.session.get(SESSION_CART_KEY, {}).items()}
+
+    def _save(self, quantities):
+        self.session[SESSION_CART_KEY] = {str(product_id): quantity for product_id, quantity in quantities.items()}
+
+    def clear(self):
+        self.session.pop(SESSION_CART_KEY, None)
+
+
+class CacheCartStore(_MappingCartStore):
+    """User cart kept in the cache and written back to the database behind.
+
+    A cart is read from the database once and then lives in the ``carts``
+    cache. Changes are persisted in one batch (see
+    CartItem.objects.replace_for_user) when the cart was last written more
+    than CART_FLUSH_INTERVAL seconds ago, at checkout, and by the
+    ``flush_carts`` command for carts that went idle in between.
+
+    Every change is a read-modify-write of the cached entry, so each one
+    (and each write-back) holds the cart's lock (_cart_lock) and re-reads the
+    entry under it: concurrent changes to one cart, from double clicks or
+    parallel tabs, queue up instead of overwriting each other.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.cache = _cart_cache()
+        self.key = _user_cart_key(user.pk)
+        self.timeout = getattr(settings, 'CART_CACHE_TIMEOUT', CART_CACHE_TIMEOUT)
+        self._entry = None
+
+    def _load(self):
+        if self._entry is None:
+            self._entry = self.cache.get(self.key)
+        if self._entry is None:
+            self._entry = {
+                'lines': dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')),
+                'dirty': False,
+                'flushed_at': time.time(),
+            }
+            self.cache.set(self.key, self._entry, self.timeout)
+        return self._entry
+
+    @contextmanager
+    def _locked(self):
+        with _cart_lock(f'cart-{self.user.pk}'):
+            # whatever was read before the lock may be stale by now
+            self._entry = None
+            yield
+
+    def add(self, product_id, quantity):
+        with self._locked():
+            return super().add(product_id, quantity)
+
+    def merge(self, incoming):
+        with self._locked():
+            super().merge(incoming)
+
+    def update(self, changes):
+        with self._locked():
+            return super().update(changes)
+
+    def remove(self, product_id):
+        with self._locked():
+            return super().remove(product_id)
+
+    def clear(self):
+        with self._locked():
+            super().clear()
+
+    def quantities(self):
+        return dict(self._load()['lines'])
+
+    def _save(self, quantities):
+        entry = self._load()
+        entry['lines'] = quantities
+        entry['dirty'] = True
+        if time.time() - entry['flushed_at'] >= getattr(settings, 'CART_FLUSH_INTERVAL', CART_FLUSH_INTERVAL):
+            self._persist(entry)
+        else:
+            _mark_dirty(self.user.pk)
+        self.cache.set(self.key, entry, self.timeout)
+
+    def _persist(self, entry):
+        CartItem.objects.replace_for_user(self.user, entry['lines'])
+        entry['dirty'] = False
+        entry['flushed_at'] = time.time()
+
+    def flush(self, release=False):
+        """Write the cart to the database if it changed since the last write.
+
+        With ``release`` the cached copy is dropped as well, so the database is
+        the only copy from then on (checkout and the payment callbacks work on
+        Cart/CartItem directly).
+        """
+        with self._locked():
+            entry = self.cache.get(self.key)
+            if entry is not None and entry['dirty']:
+                self._persist(entry)
+                if not release:
+                    self.cache.set(self.key, entry, self.timeout)
+            if release:
+                self.cache.delete(self.key)
+            self._entry = None
+
+
+def _mark_dirty(user_id):
+    cache = _cart_cache()
+    with _cart_lock('dirty-carts'):
+        dirty = cache.get(DIRTY_CARTS_KEY) or set()
+        if user_id not in dirty:
+            dirty.add(user_id)
+            cache.set(DIRTY_CARTS_KEY, dirty, None)
+
+
+def flush_dirty_carts():
+    """Persist every cached cart with unwritten changes. Returns how many were written."""
+    cache = _cart_cache()
+    with _cart_lock('dirty-carts'):
+        dirty = cache.get(DIRTY_CARTS_KEY) or set()
+        cache.delete(DIRTY_CARTS_KEY)
+    for user in User.objects.filter(pk__in=dirty):
+        CacheCartStore(user).flush()
+    return len(dirty)
+
+
+# ======================
+# LOOKUP
+# ======================
+def get_user_cart_store(user):
+    if getattr(settings, 'CART_STORE', 'database') == 'cache':
+        return CacheCartStore(user)
+    return DatabaseCartStore(user)
+
+
+def get_cart_store(request):
+    """The cart store for this request: the session for anonymous visitors,
+    otherwise the backend named by settings.CART_STORE ('database' or 'cache')."""
+    if not request.user.is_authenticated:
+        return SessionCartStore(request.session)
+    return get_user_cart_store(request.user)
+
+
+def discard_cached_cart(user_id, product_ids=None):
+    """Forget the ordered lines in the cached copy of a user's cart once the
+    database copy has been turned into an order, so they do not come back.
+
+    With ``product_ids`` only those lines are dropped, keeping anything added
+    since; otherwise the whole cached cart is.
+    """
+    if getattr(settings, 'CART_STORE', 'database') != 'cache':
+        return
+    cache, key = _cart_cache(), _user_cart_key(user_id)
+    with _cart_lock(f'cart-{user_id}'):
+        if product_ids is None:
+            cache.delete(key)
+            return
+        entry = cache.get(key)
+        if entry is not None:
+            for product_id in product_ids:
+                entry['lines'].pop(product_id, None)
+            cache.set(key, entry, getattr(settings, 'CART_CACHE_TIMEOUT', CART_CACHE_TIMEOUT))
+
+
+def merge_session_cart(request, user):
+    """Move an anonymous session cart into ``user``'s cart (called on login)."""
+    session_store = SessionCartStore(request.session)
+    quantities = session_store.quantities()
+    if quantities:
+        get_user_cart_store(user).merge(quantities)
+        session_store.clear()
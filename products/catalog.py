@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from core.pagination import encode_cursor
+
+from .models import Category, Product
+
+# Number of cards shown per category on the catalog page
+SECTION_SIZE = 12
+
+# Cache key holding the time (ns) of the last catalog change
+CATALOG_GENERATION_KEY = 'products:catalog-generation'
+
+
+def category_sections(per_section=SECTION_SIZE):
+    """Build every catalog section from a single windowed query.
+
+    Sections follow the Category table's sort order; that small table is the
+    only other query, so adding a category costs nothing extra.
+
+    Products are numbered within their category (newest first) and only the
+    first ``per_section + 1`` rows of each category are fetched. The extra row
+    is never shown; it only tells us whether the section needs a "load more"
+    link, so no COUNT query is required. The link carries a keyset cursor for
+    ``category_products``.
+    """
+    ranked = (
+        Product.objects.filter(is_approved=True)
+        .annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=[F('category')],
+                order_by=F('id').desc(),
+            )
+        )
+        .filter(row_number__lte=per_section + 1)
+        .order_by('category', '-id')
+    )
+
+    grouped = {}
+    for product in ranked:
+        grouped.setdefault(product.category_id, []).append(product)
+
+    sections = []
+    for category in Category.objects.all():
+        products = grouped.get(category.name, [])
+        has_more = len(products) > per_section
+        products = products[:per_section]
+        sections.append({
+            'category': category,
+            'label': category.name,
+            'slug': category.slug,
+            'products': products,
+            'cursor': encode_cursor([products[-1].id]) if has_more else None,
+        })
+    return sections
+
+
+def _shared_cache():
+    # every process must see the same generation, so not the per-process default
+    return caches[getattr(settings, 'SHARED_CACHE_ALIAS', 'default')]
+
+
+def catalog_generation():
+    """Return the time (ns) of the last product change seen by the cache.
+
+    Used as the validator for conditional GETs on the catalog pages. If the
+    cache has lost it, a fresh value is stored, which merely forces clients to
+    refetch once.
+    """
+    generation = _shared_cache().get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        _shared_cache().add(CATALOG_GENERATION_KEY, generation, None)
+    return generation
+
+
+def bump_catalog_generation():
+    _shared_cache().set(CATALOG_GENERATION_KEY, time.time_ns(), None)
@@ -0,0 +1,173 @@
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .catalog import catalog_generation
+from .models import Product
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = (
+    ('under-500', 'Under RS500', None, 500),
+    ('500-2000', 'RS500 – RS2000', 500, 2000),
+    ('2000-5000', 'RS2000 – RS5000', 2000, 5000),
+    ('5000-up', 'RS5000 and above', 5000, None),
+)
+
+FACET_PARAMS = ('category', 'price', 'vendor')
+
+FACET_TIMEOUT = 60 * 60
+
+
+def _band_condition(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def price_band_expression():
+    """SQL CASE mapping each product's price onto its PRICE_BANDS key."""
+    return Case(
+        *[When(_band_condition(low, high), then=Value(key)) for key, _label, low, high in PRICE_BANDS],
+        output_field=CharField(),
+    )
+
+
+# ======================
+# FILTERS
+# ======================
+def parse_filters(params):
+    """Read the selected facet values from a QueryDict.
+
+    Categories are selected by slug, price bands by key and vendors by id.
+    Unknown values are dropped.
+    """
+    bands = {key for key, _label, _low, _high in PRICE_BANDS}
+    return {
+        'category': [slug for slug in params.getlist('category') if slug],
+        'price': [key for key in params.getlist('price') if key in bands],
+        'vendor': [int(pk) for pk in params.getlist('vendor') if pk.isdigit()],
+    }
+
+
+def is_filtered(filters):
+    return any(filters.values())
+
+
+def filter_products(queryset, filters):
+    """Narrow ``queryset`` to the selected facet values.
+
+    Values within one facet are OR-ed, facets are AND-ed. The predicates line
+    up with the (is_approved, category, price) and (vendor, is_approved)
+    indexes on Product.
+    """
+    if filters['category']:
+        queryset = queryset.filter(category__slug__in=filters['category'])
+    if filters['price']:
+        condition = Q()
+        for key, _label, low, high in PRICE_BANDS:
+            if key in filters['price']:
+                condition |= _band_condition(low, high)
+        queryset = queryset.filter(condition)
+    if filters['vendor']:
+        queryset = queryset.filter(vendor_id__in=filters['vendor'])
+    return queryset
+
+
+# ======================
+# COUNTS
+# ======================
+def _facet_rows():
+    """Approved product counts grouped by (category, price band, vendor).
+
+    One GROUP BY query covers every facet. The result is cached against the
+    catalog generation, so it is rebuilt at most once per catalog change.
+    """
+    key = f'products:facets:{catalog_generation()}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            Product.objects.filter(is_approved=True)
+            .annotate(band=price_band_expression())
+            .values(
+                'category', 'category__slug', 'category__sort_order',
+                'band', 'vendor', 'vendor__user__username',
+            )
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        cache.set(key, rows, FACET_TIMEOUT)
+    return rows
+
+
+def facet_counts(filters, params):
+    """Return the category, price and vendor facets with their live counts.
+
+    A facet's counts apply the filters of the *other* facets only, so every
+    value shows how many products selecting it would add. All of it is worked
+    out in Python from the grouped rows of ``_facet_rows``.
+
+    Each facet is a list of dicts with value, label, count, selected and url
+    (the current query string with that value toggled).
+    """
+    def matches(row, skip):
+        return (
+            (skip == 'category' or not filters['category'] or row['category__slug'] in filters['category'])
+            and (skip == 'price' or not filters['price'] or row['band'] in filters['price'])
+            and (skip == 'vendor' or not filters['vendor'] or row['vendor'] in filters['vendor'])
+        )
+
+    categories, bands, vendors = {}, {}, {}
+    for row in _facet_rows():
+        category = categories.setdefault(
+            row['category__slug'],
+            {'label': row['category'], 'order': (row['category__sort_order'], row['category']), 'count': 0},
+        )
+        band = bands.setdefault(row['band'], {'count': 0})
+        if matches(row, 'category'):
+            category['count'] += row['count']
+        if matches(row, 'price'):
+            band['count'] += row['count']
+        if row['vendor'] is not None:
+            vendor = vendors.setdefault(
+                row['vendor'],
+                {'label': row['vendor__user__username'], 'order': row['vendor__user__username'], 'count': 0},
+            )
+            if matches(row, 'vendor'):
+                vendor['count'] += row['count']
+
+    def facet(name, values):
+        selected = filters[name]
+        return [
+            {
+                'value': value,
+                'label': info['label'],
+                'count': info['count'],
+                'selected': value in selected,
+                'url': _toggle_url(params, name, value),
+            }
+            for value, info in values
+        ]
+
+    return {
+        'category': facet('category', sorted(categories.items(), key=lambda item: item[1]['order'])),
+        'price': facet('price', [
+            (key, {'label': label, 'count': bands.get(key, {'count': 0})['count']})
+            for key, label, _low, _high in PRICE_BANDS
+        ]),
+        'vendor': facet('vendor', sorted(vendors.items(), key=lambda item: item[1]['order'])),
+    }
+
+
+def _toggle_url(params, name, value):
+    query = params.copy()
+    query.pop('cursor', None)
+    values = query.getlist(name)
+    value = str(value)
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    query.setlist(name, values)
+    return '?' + query.urlencode()
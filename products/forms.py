@@ -0,0 +1,19 @@
+from django import forms
+
+
+class ProductStockForm(forms.ModelForm):
+    """ModelForm for editing a Product that posts back the stock figure it
+    was rendered with, so saving applies only the edit to the stock and keeps
+    units checked out while the form was open (see Product.edit_stock)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'stock' in self.fields:
+            self.fields['stock'].show_hidden_initial = True
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'stock' in self.fields and 'stock' in cleaned_data and self.instance.pk is not None:
+            shown = self.data.get(self.add_initial_prefix('stock'))
+            self.instance.edit_stock(cleaned_data['stock'], shown=shown)
+        return cleaned_data
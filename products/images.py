@@ -0,0 +1,91 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+
+from core.jobs import enqueue
+
+# Longest edge (px) of each generated variant
+VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 440,
+    'detail': 1000,
+}
+
+# Every variant is written as WebP plus a JPEG fallback
+VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def variant_name(image_name, size, ext):
+    """products/bag.jpg -> products/variants/bag-card.webp"""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/variants/{stem}-{size}.{ext}'
+
+
+def generate_variants(product_id, image_name, storage=None):
+    """Write every size/format variant of ``image_name`` and flag the product.
+
+    Runs as the ``products.generate_variants`` background job, outside any
+    transaction: the files are written first and only the final UPDATE
+    touches the database. The product is only flagged if it still points at
+    the same image; its version is bumped so cached cards re-render with the
+    new markup, and so is the catalog generation so conditional GETs do too.
+    """
+    from PIL import Image, ImageOps
+
+    from .catalog import bump_catalog_generation
+    from .models import Product
+
+    storage = storage or default_storage
+    with storage.open(image_name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    for size, edge in VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        for ext, fmt, options in VARIANT_FORMATS:
+            image = resized
+            if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, fmt, **options)
+
+            name = variant_name(image_name, size, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+
+    flagged = Product.objects.filter(pk=product_id, image=image_name).update(
+        image_variants=True,
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
+    if flagged:
+        # .update() skips the post_save hook that normally does this
+        bump_catalog_generation()
+
+
+def delete_variants(image_name, storage=None):
+    storage = storage or default_storage
+    for size in VARIANT_SIZES:
+        for ext, _fmt, _options in VARIANT_FORMATS:
+            name = variant_name(image_name, size, ext)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def schedule_variants(product):
+    """Queue the generation of ``product``'s image variants for the job worker,
+    keeping the resize work off the request. The job commits (or rolls back)
+    together with the product."""
+    if not product.image:
+        return
+    enqueue('products.generate_variants', product_id=product.pk, image_name=product.image.name)
@@ -0,0 +1,8 @@
+from core.jobs import job
+
+from .images import generate_variants
+
+
+@job('products.generate_variants', max_attempts=3)
+def build_image_variants(product_id, image_name):
+    generate_variants(product_id, image_name)
@@ -0,0 +1,31 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from products.archive import ARCHIVE_BATCH_SIZE, archive_orders
+
+UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_age(value):
+    """'180d' -> timedelta(days=180); units h, d (default) and w."""
+    match = re.fullmatch(r'(\d+)([hdw]?)', value.strip())
+    if not match:
+        raise CommandError(f"Invalid age {value!r}; use e.g. 180d, 26w or 72h.")
+    number, unit = match.groups()
+    return timedelta(**{UNITS[unit or 'd']: int(number)})
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than --older-than into the archive tables (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', default='180d', help="Age of orders to archive, e.g. 180d (default).")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Orders moved per transaction.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - parse_age(options['older_than'])
+        archived = archive_orders(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} order(s) created before {before:%Y-%m-%d %H:%M}."))
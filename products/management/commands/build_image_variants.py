@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from products.images import generate_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for product images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate variants for every product.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if not options['all']:
+            products = products.filter(image_variants=False)
+
+        done = failed = 0
+        for product_id, image_name in products.values_list('id', 'image').iterator():
+            try:
+                generate_variants(product_id, image_name)
+                done += 1
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"Product #{product_id} ({image_name}): {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} product(s), {failed} failed."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.cart_store import flush_dirty_carts
+
+
+class Command(BaseCommand):
+    help = "Write cached carts with unsaved changes back to the database (run every few minutes)."
+
+    def handle(self, *args, **options):
+        flushed = flush_dirty_carts()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} cart(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.services import prune_checkout_quotes, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Return the stock held by expired reservations of unpaid orders and delete "
+        "expired checkout quotes (run every few minutes)."
+    )
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        pruned = prune_checkout_quotes()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} reservation(s), pruned {pruned} quote(s)."))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+# The categories that used to be hard-coded as Product.CATEGORY_CHOICES
+INITIAL_CATEGORIES = ['Foods & Bakery', 'Crochet', 'Fashion (Clothes)']
+
+
+def move_categories(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    Product.objects.filter(category='').update(category='Other')
+    names = list(INITIAL_CATEGORIES)
+    for name in Product.objects.values_list('category', flat=True).distinct().order_by('category'):
+        if name not in names:
+            names.append(name)
+
+    counts = {
+        row['category']: row
+        for row in Product.objects.values('category').annotate(
+            total=Count('id'), approved=Count('id', filter=Q(is_approved=True))
+        )
+    }
+    Category.objects.bulk_create([
+        Category(
+            name=name,
+            slug=slugify(name),
+            sort_order=position,
+            product_count=counts.get(name, {}).get('total', 0),
+            approved_count=counts.get(name, {}).get('approved', 0),
+        )
+        for position, name in enumerate(names)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(max_length=60, unique=True)),
+                ('sort_order', models.PositiveIntegerField(default=0)),
+                ('product_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('approved_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['sort_order', 'name'],
+            },
+        ),
+        migrations.RunPython(move_categories, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(db_column='category', on_delete=django.db.models.deletion.PROTECT, related_name='products', to='products.category', to_field='name'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0020_category'),
+        ('vendors', '0007_alter_order_id_alter_vendor_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_approved', 'category', 'price'], name='product_approved_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['vendor', 'is_approved'], name='product_vendor_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_facet_indexes'),
+        ('vendors', '0007_alter_order_id_alter_vendor_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_approved', 'updated_at', 'id'], name='product_approved_updated_idx'),
+        ),
+    ]
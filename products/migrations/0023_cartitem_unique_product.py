@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+MAX_LINE_QUANTITY = 15
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold duplicate (cart, product) lines into the oldest one."""
+    CartItem = apps.get_model('products', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(lines=Count('id'), keep=Min('id'))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        lines = CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id'])
+        quantity = min(sum(line.quantity for line in lines), MAX_LINE_QUANTITY)
+        lines.exclude(id=row['keep']).delete()
+        lines.filter(id=row['keep']).update(quantity=quantity)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_product_feed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='cartitem_unique_product'),
+        ),
+    ]
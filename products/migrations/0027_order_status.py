@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def status_from_flags(apps, schema_editor):
+    Order = apps.get_model('products', 'Order')
+    Order.objects.filter(is_completed=True).update(status='delivered')
+    Order.objects.filter(is_paid=True, is_completed=False).update(status='paid')
+
+
+def flags_from_status(apps, schema_editor):
+    Order = apps.get_model('products', 'Order')
+    Order.objects.filter(status='delivered').update(is_paid=True, is_completed=True)
+    Order.objects.filter(status='paid').update(is_paid=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0026_product_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('delivered', 'Delivered')], max_length=10)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('delivered', 'Delivered')], max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('delivered', 'Delivered')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(status_from_flags, flags_from_status),
+        migrations.RemoveField(
+            model_name='order',
+            name='is_completed',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='is_paid',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='orderstatuschange',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderstatuschange',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='products.order'),
+        ),
+    ]
@@ -1,44 +1,313 @@
-from django.db import models
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .storage import product_image_storage
+
+# ======================
+# CATEGORY
+# ======================
+class Category(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    slug = models.SlugField(max_length=60, unique=True)
+    sort_order = models.PositiveIntegerField(default=0)
+    # Maintained by Product.save() and the product post_delete signal
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    approved_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ['sort_order', 'name']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def adjust_counts(name, total=0, approved=0):
+        """Apply a delta to a category's counters with a single UPDATE."""
+        if name and (total or approved):
+            Category.objects.filter(name=name).update(
+                product_count=F('product_count') + total,
+                approved_count=F('approved_count') + approved,
+            )
+
 
 # ======================
 # PRODUCT
 # ======================
 class Product(models.Model):
-    CATEGORY_CHOICES = [
-        ('Foods & Bakery', 'Foods & Bakery'),
-        ('Crochet', 'Crochet'),
-        ('Fashion (Clothes)', 'Fashion (Clothes)'),
-    ]
-
     name = models.CharField(max_length=255)
-    image = models.ImageField(upload_to='products/')
-    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
+    image = models.ImageField(upload_to='products/', storage=product_image_storage)
+    # Set once the resized WebP/JPEG variants of `image` have been generated
+    image_variants = models.BooleanField(default=False, editable=False)
+    # Keyed on the category name, so the column still holds the name itself
+    category = models.ForeignKey(
+        Category, to_field='name', db_column='category', on_delete=models.PROTECT, related_name='products'
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Units available to order; empty means the vendor does not track stock
+    stock = models.PositiveIntegerField(null=True, blank=True)
     vendor = models.ForeignKey("vendors.Vendor", on_delete=models.CASCADE, null=True, blank=True)
     is_approved = models.BooleanField(default=False)
     description = models.TextField(blank=True, null=True)
+    # Bumped on every save; cached fragments of this product are keyed on it
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # catalog facet filters
+            models.Index(fields=['is_approved', 'category', 'price'], name='product_approved_cat_idx'),
+            models.Index(fields=['vendor', 'is_approved'], name='product_vendor_approved_idx'),
+            # incremental sync of the product feed (?since=)
+            models.Index(fields=['is_approved', 'updated_at', 'id'], name='product_approved_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so a replaced image can release its stored blob
+        instance._loaded_image = instance.__dict__.get('image')
+        # stock is applied as a change against this, never written back as read
+        if 'stock' in instance.__dict__:
+            instance._loaded_stock = instance.stock
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        stock_update = {}
+        if self.pk is not None:
+            self.version = (self.version or 0) + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+            if not adding and hasattr(self, '_loaded_stock') and not kwargs.get('force_insert'):
+                # checkouts take stock with conditional UPDATEs while an edit
+                # form is open, so a save never writes back the stock figure
+                # read when the form was loaded; an edited figure is applied
+                # as a change instead
+                if update_fields is None:
+                    deferred = self.get_deferred_fields()
+                    kwargs['update_fields'] = {
+                        f.name for f in self._meta.concrete_fields
+                        if not f.primary_key and f.name != 'stock' and f.attname not in deferred
+                    } | {'version', 'updated_at'}
+                    stock_update = self._stock_update()
+                elif 'stock' in update_fields:
+                    kwargs['update_fields'].discard('stock')
+                    stock_update = self._stock_update()
+
+        with transaction.atomic():
+            # the counters move from the row being replaced, read under the
+            # write lock, not from when this instance was loaded: two
+            # concurrent approvals must count once
+            old_category, old_approved = None, False
+            if not adding:
+                old_category, old_approved = (
+                    Product.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('category_id', 'is_approved').first()
+                ) or (None, False)
+            super().save(*args, **kwargs)
+            if stock_update:
+                Product.objects.filter(pk=self.pk).update(**stock_update)
+                self.stock = Product.objects.filter(pk=self.pk).values_list('stock', flat=True).get()
+            if old_category == self.category_id:
+                Category.adjust_counts(self.category_id, approved=int(self.is_approved) - int(bool(old_approved)))
+            else:
+                Category.adjust_counts(old_category, total=-1, approved=-int(bool(old_approved)))
+                Category.adjust_counts(self.category_id, total=1, approved=int(self.is_approved))
+        self._loaded_stock = self.stock
+
+    def edit_stock(self, value, shown=None):
+        """Set the stock figure entered in an edit form.
+
+        ``shown`` is the raw figure the form was rendered with (posted back in
+        a hidden input). When given, the save applies the difference from it,
+        so units checked out while the form was open are not handed back.
+        """
+        field = self._meta.get_field('stock')
+        if shown is not None:
+            self._loaded_stock = field.to_python(None if shown == '' else shown)
+        self.stock = field.to_python(None if value == '' else value)
+
+    def _stock_update(self):
+        """UPDATE kwargs applying an edited stock figure, or {} if it is unchanged.
+
+        Starting or stopping tracking sets the value outright; otherwise the
+        difference from the loaded figure is added to the row's current stock
+        (never below zero), keeping units taken since the form was loaded.
+        """
+        new = self._meta.get_field('stock').to_python(self.stock)
+        old = self._loaded_stock
+        if new == old:
+            return {}
+        if new is None or old is None:
+            return {'stock': new}
+        return {'stock': Greatest(F('stock') + (new - old), Value(0))}
+
 
 # ======================
 # CART
 # ======================
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+# Most units of one product a cart line may hold
+MAX_LINE_QUANTITY = 15
+
+
+def _cents(value):
+    # SQLite hands computed decimals back unscaled (17390 rather than 17390.00)
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate items_count and items_total, summed by the database."""
+        return self.annotate(
+            items_count=Coalesce(Sum('items__quantity'), 0),
+            items_total=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price'), output_field=MONEY),
+                Value(Decimal('0')),
+                output_field=MONEY,
+            ),
+        )
+
+    def with_items(self):
+        """Prefetch the lines with their products and line totals."""
+        return self.prefetch_related(Prefetch('items', queryset=CartItem.objects.for_display()))
+
+
+class CartManager(models.Manager.from_queryset(CartQuerySet)):
+    def for_user(self, user):
+        """Load (or create) the user's cart with totals and items in two queries."""
+        cart = self.with_totals().with_items().filter(user=user).first()
+        if cart is None:
+            self.get_or_create(user=user)
+            cart = self.with_totals().with_items().get(user=user)
+        return cart
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
 
+    objects = CartManager()
+
     def __str__(self):
         return f"Cart of {self.user.username}"
 
+    # Carts loaded through Cart.objects.with_totals() / for_user() carry the
+    # sums as annotations; anything else falls back to one aggregate query.
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        if hasattr(self, 'items_count'):
+            return self.items_count
+        return self.items.aggregate(n=Coalesce(Sum('quantity'), 0))['n']
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        if hasattr(self, 'items_total'):
+            return _cents(self.items_total)
+        return _cents(self.items.aggregate(total=Coalesce(
+            Sum(F('quantity') * F('product__price'), output_field=MONEY), Value(Decimal('0')), output_field=MONEY,
+        ))['total'])
+
+
+class CartItemQuerySet(models.QuerySet):
+    def add_for_user(self, user, product_id, quantity):
+        """Add ``quantity`` of a product to the user's cart, capped at MAX_LINE_QUANTITY.
+
+        The cart row is created if missing (INSERT ... ON CONFLICT DO NOTHING)
+        and the line is upserted by a single INSERT ... SELECT ... ON CONFLICT
+        DO UPDATE, both in one transaction, so double clicks and parallel tabs
+        cannot race into duplicate lines or lost increments. Returns
+        (item_id, quantity), or None if the product does not exist.
+        """
+        cart_table = Cart._meta.db_table
+        item_table = CartItem._meta.db_table
+        product_table = Product._meta.db_table
+        least = 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {cart_table} (user_id) VALUES (%s) ON CONFLICT (user_id) DO NOTHING',
+                [user.pk],
+            )
+            cursor.execute(
+                f'INSERT INTO {item_table} (cart_id, product_id, quantity) '
+                f'SELECT c.id, p.id, %s FROM {cart_table} c, {product_table} p '
+                f'WHERE c.user_id = %s AND p.id = %s '
+                f'ON CONFLICT (cart_id, product_id) DO UPDATE '
+                f'SET quantity = {least}({item_table}.quantity + excluded.quantity, %s) '
+                f'RETURNING id, quantity',
+                [quantity, user.pk, product_id, MAX_LINE_QUANTITY],
+            )
+            return cursor.fetchone()
+
+    def set_quantities(self, user, quantities):
+        """Apply a {product_id: quantity} map to the lines of the user's cart.
+
+        Only the user's own matching lines are loaded (one query), so other
+        carts cannot be touched. Changed quantities are written with one
+        bulk_update and zero quantities removed with one DELETE.
+        Returns (kept_items, removed_product_ids).
+        """
+        items = list(self.filter(cart__user=user, product_id__in=quantities).select_related('product'))
+        kept, updated, removed = [], [], []
+        for item in items:
+            quantity = quantities[item.product_id]
+            if quantity <= 0:
+                removed.append(item.product_id)
+                continue
+            kept.append(item)
+            if item.quantity != min(quantity, MAX_LINE_QUANTITY):
+                item.quantity = min(quantity, MAX_LINE_QUANTITY)
+                updated.append(item)
+
+        with transaction.atomic(using=self.db):
+            if updated:
+                self.bulk_update(updated, ['quantity'])
+            if removed:
+                self.filter(cart__user=user, product_id__in=removed).delete()
+        return kept, removed
+
+    def replace_for_user(self, user, quantities):
+        """Make the user's cart hold exactly {product_id: quantity}.
+
+        Used to persist carts kept elsewhere (see products.cart_store): lines
+        missing from ``quantities`` are deleted and the rest upserted with one
+        bulk INSERT ... ON CONFLICT DO UPDATE. Products that no longer exist
+        are dropped.
+        """
+        wanted = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+        product_ids = set(Product.objects.filter(id__in=wanted).values_list('id', flat=True))
+        with transaction.atomic(using=self.db):
+            cart, _ = Cart.objects.get_or_create(user=user)
+            self.filter(cart=cart).exclude(product_id__in=product_ids).delete()
+            self.bulk_create(
+                [
+                    CartItem(cart=cart, product_id=product_id, quantity=min(wanted[product_id], MAX_LINE_QUANTITY))
+                    for product_id in product_ids
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+
+    def for_display(self):
+        return (
+            self.select_related('product')
+            .annotate(line_total=ExpressionWrapper(F('quantity') * F('product__price'), output_field=MONEY))
+            .order_by('id')
+        )
 
 
 class CartItem(models.Model):
@@ -46,14 +315,30 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cartitem_unique_product'),
+        ]
+
     @property
     def total_price(self):
+        if hasattr(self, 'line_total'):
+            return _cents(self.line_total)
         return self.product.price * self.quantity
 
 
 # ======================
 # ORDER
 # ======================
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Prefetch the items with their products and line totals."""
+        items = self.model._meta.get_field('items').related_model
+        return self.prefetch_related(Prefetch('items', queryset=items.objects.for_display()))
+
+
 class Order(models.Model):
     PAYMENT_CHOICES = (
         ('esewa', 'eSewa'),
@@ -61,20 +346,81 @@ class Order(models.Model):
         ('cod', 'Cash on Delivery'),
     )
 
+    PENDING = 'pending'
+    PAID = 'paid'
+    DELIVERED = 'delivered'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PAID, 'Paid'),
+        (DELIVERED, 'Delivered'),
+    )
+    # status -> statuses it may move to (see services.transition_order);
+    # paid can go back to pending when an admin reverses a payment
+    TRANSITIONS = {
+        PENDING: {PAID},
+        PAID: {DELIVERED, PENDING},
+        DELIVERED: set(),
+    }
+
     buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_orders')
     created_at = models.DateTimeField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES)
-    is_paid = models.BooleanField(default=False)
-    is_completed = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination: newest first, overall and per buyer
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['buyer', 'created_at', 'id'], name='order_buyer_created_idx'),
+            # status counts and per-status listings, newest first
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.buyer.username}"
 
+    def can_move_to(self, status):
+        return status in self.TRANSITIONS[self.status]
+
+    @property
+    def is_paid(self):
+        return self.status in (self.PAID, self.DELIVERED)
+
+    @property
+    def is_completed(self):
+        return self.status == self.DELIVERED
+
+
+class OrderStatusChange(models.Model):
+    """One row per status move of an order, appended by services.transition_order."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
 
 # ======================
 # ORDER ITEM
 # ======================
+class OrderItemQuerySet(models.QuerySet):
+    def for_display(self):
+        return (
+            self.select_related('product')
+            .annotate(line_total=ExpressionWrapper(F('quantity') * F('price'), output_field=MONEY))
+            .order_by('id')
+        )
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
@@ -83,9 +429,17 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     is_completed = models.BooleanField(default=False)
 
+    objects = OrderItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    @property
+    def total_price(self):
+        if hasattr(self, 'line_total'):
+            return _cents(self.line_total)
+        return self.price * self.quantity
+
 
 # ======================
 # PAYMENT
@@ -97,3 +451,217 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='payment_created_idx'),
+        ]
+
+
+# ======================
+# CHECKOUT QUOTE
+# ======================
+# How long the prices shown on the checkout page stay valid
+QUOTE_TTL = timedelta(minutes=30)
+
+
+def _quote_token():
+    return secrets.token_urlsafe(24)
+
+
+class CheckoutQuote(models.Model):
+    """Snapshot of a cart's lines and total, as shown on the checkout page.
+
+    The checkout form posts the token back; the order is created from the
+    quote while it is valid, and the one-to-one ``order`` link means a quote
+    yields at most one order however often the form is submitted.
+    """
+    token = models.CharField(max_length=40, unique=True, default=_quote_token, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='checkout_quotes')
+    # [{"product_id": ..., "quantity": ..., "price": "..."}]
+    lines = models.JSONField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    order = models.OneToOneField(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='quote')
+
+    def __str__(self):
+        return f"Quote {self.token[:8]} for {self.user_id}"
+
+    @property
+    def is_valid(self):
+        return self.order_id is None and self.expires_at > timezone.now()
+
+    @classmethod
+    def for_cart(cls, user):
+        """Quote the user's cart from one joined query over its lines and products.
+
+        Returns (quote, items), the items being the CartItems shown on the page,
+        or (None, []) for an empty cart. The user's latest unclaimed quote is
+        reused (and its expiry pushed back) while it still matches the cart
+        line for line at current prices, so reloading the checkout page does
+        not add a row each time.
+        """
+        items = list(CartItem.objects.for_display().filter(cart__user=user))
+        if not items:
+            return None, []
+        lines = [
+            {'product_id': item.product_id, 'quantity': item.quantity, 'price': str(item.product.price)}
+            for item in items
+        ]
+        expires_at = timezone.now() + QUOTE_TTL
+        latest = (
+            cls.objects.filter(user=user, order__isnull=True, expires_at__gt=timezone.now())
+            .order_by('-created_at', '-id')
+            .first()
+        )
+        if latest is not None and latest.lines == lines:
+            # the update only matches while the quote is still unclaimed
+            if cls.objects.filter(pk=latest.pk, order__isnull=True).update(expires_at=expires_at):
+                latest.expires_at = expires_at
+                return latest, items
+        quote = cls.objects.create(
+            user=user,
+            lines=lines,
+            total=sum(item.total_price for item in items),
+            expires_at=expires_at,
+        )
+        return quote, items
+
+
+# ======================
+# STOCK RESERVATION
+# ======================
+# How long stock is held for an order awaiting online payment
+RESERVATION_TTL = timedelta(minutes=15)
+
+
+class StockReservation(models.Model):
+    """Units taken off Product.stock for an order.
+
+    Held reservations of unpaid orders are handed back once they expire;
+    finalizing the order commits them.
+    """
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = (
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+    )
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # the expiry sweep only looks at held reservations
+            models.Index(fields=['status', 'expires_at'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order #{self.order_id} ({self.status})"
+
+
+# ======================
+# IDEMPOTENCY KEY
+# ======================
+class IdempotencyKey(models.Model):
+    """One row per payment callback that has been processed.
+
+    ``key`` is the gateway's transaction id (e.g. ``khalti:<pidx>``); the unique
+    index lets only one of several concurrent duplicates commit, and
+    ``result`` is what the others and later repeats are answered with.
+    """
+    key = models.CharField(max_length=150, unique=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='idempotency_keys')
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+
+# ======================
+# STORED BLOB
+# ======================
+class StoredBlob(models.Model):
+    """Reference count of a file kept by ContentAddressedStorage."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+# ======================
+# ARCHIVE
+# ======================
+# Completed orders older than a cut-off are moved here by `manage.py
+# archive_orders`, keeping Order/OrderItem/Payment (and their indexes) small.
+# Rows keep their original ids and look like their live counterparts to
+# templates; see products/archive.py for lookups that fall back to them.
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(primary_key=True)
+    buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    created_at = models.DateTimeField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_CHOICES)
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    # the order's OrderStatusChange rows as [from, to, changed_by id, changed_at]
+    history = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    is_archived = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer', 'created_at', 'id'], name='archived_order_buyer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id}"
+
+    @property
+    def is_paid(self):
+        return self.status in (Order.PAID, Order.DELIVERED)
+
+    @property
+    def is_completed(self):
+        return self.status == Order.DELIVERED
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='+')
+    vendor = models.ForeignKey("vendors.Vendor", on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_completed = models.BooleanField(default=False)
+
+    objects = OrderItemQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} (archived order #{self.order_id})"
+
+    total_price = OrderItem.total_price
+
+
+class ArchivedPayment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order = models.OneToOneField(ArchivedOrder, on_delete=models.CASCADE, related_name='payment')
+    payment_method = models.CharField(max_length=20)
+    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, default='pending')
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Payment #{self.id} (archived order #{self.order_id})"
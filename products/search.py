@@ -0,0 +1,142 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.pagination import CursorPage, decode_cursor, encode_cursor, paginate
+
+from .models import Product
+
+# FTS5 virtual table mirroring Product.name / description / category.
+# The rowid of each entry is the product id.
+SEARCH_TABLE = 'products_product_search'
+
+# Column weights for bm25(): a hit in the name counts most, then the category.
+NAME_WEIGHT, DESCRIPTION_WEIGHT, CATEGORY_WEIGHT = 10.0, 1.0, 4.0
+
+# Control characters used to mark hits in snippets before HTML-escaping them
+_HIT_START, _HIT_END = '\x02', '\x03'
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def index_product(product):
+    """Insert or refresh the search entry of a product."""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+            [product.pk, product.name or '', product.description or '', product.category_id or ''],
+        )
+
+
+def unindex_product(product_id):
+    """Drop the search entry of a deleted product."""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [product_id])
+
+
+def build_match_query(text):
+    """Turn free text into a safe FTS5 query.
+
+    Every word is quoted (so user input can never be parsed as FTS syntax) and
+    all words must match; the last one is a prefix so partial words still hit.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(snippet):
+    html = escape(snippet or '')
+    return mark_safe(html.replace(_HIT_START, '<mark>').replace(_HIT_END, '</mark>'))
+
+
+def _valid_cursor(after):
+    """True for a decoded (score, id) cursor; anything else means the first page."""
+    if after is None or len(after) != 2:
+        return False
+    score, product_id = after
+    return (
+        isinstance(score, (float, int)) and not isinstance(score, bool)
+        and isinstance(product_id, int) and not isinstance(product_id, bool)
+    )
+
+
+def search_products(request, text, per_page=20, cursor_param='cursor'):
+    """Return a CursorPage of approved products matching ``text``, best first.
+
+    Results are ranked by bm25() and paged on (score, id), so the page cursor
+    seeks straight to the next rank instead of re-scoring skipped rows. Each
+    product gets a ``search_snippet`` with the matching words highlighted.
+    """
+    if not fts_enabled():
+        return _search_products_fallback(request, text, per_page, cursor_param)
+
+    match = build_match_query(text)
+    if match is None:
+        return CursorPage([], None, None, request=request, cursor_param=cursor_param)
+
+    after, _ = decode_cursor(request.GET.get(cursor_param))
+    seek_sql, params = '', [_HIT_START, _HIT_END, match]
+    if _valid_cursor(after):
+        seek_sql = 'WHERE score > %s OR (score = %s AND id > %s)'
+        params += [after[0], after[0], after[1]]
+    params.append(per_page + 1)
+
+    sql = f"""
+        SELECT id, score, snippet FROM (
+            SELECT p.id AS id,
+                   bm25({SEARCH_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}, {CATEGORY_WEIGHT}) AS score,
+                   snippet({SEARCH_TABLE}, -1, %s, %s, '…', 16) AS snippet
+            FROM {SEARCH_TABLE}
+            JOIN products_product p ON p.id = {SEARCH_TABLE}.rowid
+            WHERE {SEARCH_TABLE} MATCH %s AND p.is_approved
+        ) {seek_sql}
+        ORDER BY score, id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    products = Product.objects.in_bulk([row[0] for row in rows])
+
+    results = []
+    for product_id, _score, snippet in rows:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        product.search_snippet = _highlight(snippet)
+        results.append(product)
+
+    next_cursor = encode_cursor([rows[-1][1], rows[-1][0]]) if has_more else None
+    return CursorPage(results, next_cursor, None, request=request, cursor_param=cursor_param)
+
+
+def _search_products_fallback(request, text, per_page, cursor_param):
+    # Databases without FTS5 get a plain substring search, newest first.
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return CursorPage([], None, None, request=request, cursor_param=cursor_param)
+
+    qs = Product.objects.filter(is_approved=True)
+    for word in words:
+        qs = qs.filter(Q(name__icontains=word) | Q(description__icontains=word) | Q(category__name__icontains=word))
+    page = paginate(request, qs, ordering=('-id',), per_page=per_page, cursor_param=cursor_param)
+    for product in page:
+        product.search_snippet = product.description or ''
+    return page
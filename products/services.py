@@ -0,0 +1,246 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cart_store import discard_cached_cart
+from .models import (
+    RESERVATION_TTL, CartItem, CheckoutQuote, IdempotencyKey, Order, OrderItem, OrderStatusChange, Payment, Product,
+    StockReservation,
+)
+
+
+class OutOfStock(Exception):
+    """A tracked product cannot cover the quantity asked for."""
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Not enough stock for product(s) {', '.join(map(str, product_ids))}")
+
+
+class InvalidTransition(Exception):
+    """An order cannot move from its current status to the one asked for."""
+
+    def __init__(self, order, status):
+        self.order = order
+        self.status = status
+        super().__init__(f"Order #{order.pk} cannot move from {order.status} to {status}")
+
+
+def transition_order(order, status, by=None, **fields):
+    """Move ``order`` to ``status`` and record the move in its history.
+
+    Only moves listed in Order.TRANSITIONS are allowed. The status is written
+    with an UPDATE conditioned on the status the order was read with, so of
+    two concurrent moves only one applies; the other, like any move not
+    allowed, raises InvalidTransition. Extra ``fields`` are written by the
+    same UPDATE. Two queries: the UPDATE and the history INSERT.
+    """
+    if not order.can_move_to(status):
+        raise InvalidTransition(order, status)
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, status=order.status).update(status=status, **fields):
+            order.refresh_from_db(fields=['status'])
+            raise InvalidTransition(order, status)
+        OrderStatusChange.objects.create(order=order, from_status=order.status, to_status=status, changed_by=by)
+    order.status = status
+    for name, value in fields.items():
+        setattr(order, name, value)
+
+
+def finalize_order(order, payment):
+    """Turn the order's checkout quote into its items and record its payment.
+
+    ``payment`` is an unsaved Payment carrying the method, transaction id,
+    amount and status. In one transaction a pending order is moved to paid
+    (with its history row), the OrderItems are bulk-created from the lines
+    the order was quoted and charged for (product, quantity and price, the
+    products read with their vendors in one query), its stock reservations
+    are committed, the payment is saved and the quoted products' lines are
+    removed from the cart: ten queries whatever the order size. Whatever
+    was added to the cart after checkout stays there.
+
+    Reservations that expired and were released before the payment arrived
+    take their stock again (one conditional UPDATE per product); if it has
+    sold out meanwhile, OutOfStock is raised and nothing is written.
+
+    Orders without a quote (the payment test pages) take the buyer's cart
+    lines at current prices instead. Returns the saved payment; an order
+    that already has one gets it back unchanged, and any other order that
+    is no longer pending raises InvalidTransition.
+    """
+    with transaction.atomic():
+        # BEGIN IMMEDIATE has taken SQLite's write lock, serializing finalizers
+        existing = Payment.objects.filter(order=order).first()
+        if existing is not None:
+            # finalized before (a repeated callback or page): nothing to do again
+            return existing
+        if order.status != Order.PENDING:
+            raise InvalidTransition(order, Order.PAID)
+        transition_order(order, Order.PAID, payment_method=payment.payment_method)
+
+        quoted = CheckoutQuote.objects.filter(order=order).values_list('lines', flat=True).first()
+        if quoted:
+            products = Product.objects.select_related('vendor').in_bulk([line['product_id'] for line in quoted])
+            items = [
+                OrderItem(
+                    order=order,
+                    product=products[line['product_id']],
+                    vendor=products[line['product_id']].vendor,
+                    quantity=line['quantity'],
+                    price=Decimal(line['price']),
+                )
+                # a product deleted since checkout has no vendor left to order from
+                for line in quoted if line['product_id'] in products
+            ]
+            ordered = CartItem.objects.filter(cart__user_id=order.buyer_id, product_id__in=products)
+            ordered_product_ids = list(products)
+        else:
+            lines = list(
+                CartItem.objects.select_for_update(of=('self',))
+                .filter(cart__user_id=order.buyer_id)
+                .select_related('product__vendor')
+            )
+            items = [
+                OrderItem(
+                    order=order,
+                    product=line.product,
+                    vendor=line.product.vendor,
+                    quantity=line.quantity,
+                    price=line.product.price,
+                )
+                for line in lines
+            ]
+            ordered = CartItem.objects.filter(id__in=[line.id for line in lines])
+            ordered_product_ids = None
+        OrderItem.objects.bulk_create(items)
+
+        # reservations released while the buyer was paying must take their
+        # stock again, or the order would sell units that were put back on sale
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order, status__in=(StockReservation.HELD, StockReservation.RELEASED))
+            .values_list('id', 'product_id', 'quantity', 'status')
+        )
+        released = {}
+        for _id, product_id, quantity, status in reservations:
+            if status == StockReservation.RELEASED:
+                released[product_id] = released.get(product_id, 0) + quantity
+        if released:
+            _take_stock(released)
+        if reservations:
+            StockReservation.objects.filter(id__in=[row[0] for row in reservations]).update(
+                status=StockReservation.COMMITTED,
+            )
+
+        payment.order = order
+        payment.save()
+
+        ordered.delete()
+        transaction.on_commit(lambda: discard_cached_cart(order.buyer_id, ordered_product_ids))
+    return payment
+
+
+def run_once(key, order, work):
+    """Run ``work()`` at most once for ``key`` and return its (JSON) result.
+
+    Repeats (gateway retries, refreshed callback pages) are answered from the
+    stored result with one lookup on the unique key. The key row is inserted
+    in the same transaction as the work; if the work fails, the key is rolled
+    back with it and a retry may run again.
+
+    On SQLite the transaction starts with BEGIN IMMEDIATE, which takes the
+    database-wide write lock, so a concurrent duplicate does not wait on
+    this key alone: it waits (up to the connection timeout) behind every
+    write in progress, like any other writer. Once it gets the lock, its
+    insert hits the unique index if the first has committed, and it reads
+    the stored result. On a database with row locks (PostgreSQL) the wait
+    would be on the key's index entry only.
+    """
+    done = IdempotencyKey.objects.filter(key=key).values_list('result', flat=True).first()
+    if done is not None:
+        return done
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(key=key, order=order)
+            record.result = work()
+            record.save(update_fields=['result'])
+    except IntegrityError:
+        stored = IdempotencyKey.objects.filter(key=key).values_list('result', flat=True).first()
+        if stored is None:
+            raise
+        return stored
+    return record.result
+
+
+def _take_stock(quantities):
+    """Decrement each product's stock by its {product_id: quantity} with one
+    conditional UPDATE per product; raise OutOfStock if any falls short.
+
+    Must run inside a transaction, which the exception rolls back. Products
+    that stopped tracking stock (NULL) are not limited.
+    """
+    # a fixed order keeps concurrent reservations from deadlocking
+    short = [
+        product_id for product_id in sorted(quantities)
+        if not Product.objects.filter(Q(stock__isnull=True) | Q(stock__gte=quantities[product_id]), pk=product_id)
+        .update(stock=F('stock') - quantities[product_id])
+    ]
+    if short:
+        raise OutOfStock(short)
+
+
+def reserve_stock(order, lines, ttl=RESERVATION_TTL):
+    """Take stock for ``lines`` ((product_id, quantity) pairs) and record it
+    against ``order``.
+
+    Each tracked product is decremented by one conditional
+    ``UPDATE ... SET stock = stock - q WHERE stock >= q``, so concurrent
+    checkouts can never take more than is there. If any product falls short
+    nothing is taken and OutOfStock is raised. Products without stock
+    tracking are not limited.
+    """
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    with transaction.atomic():
+        tracked = Product.objects.filter(id__in=quantities, stock__isnull=False).values_list('id', flat=True)
+        _take_stock({product_id: quantities[product_id] for product_id in tracked})
+
+        expires_at = timezone.now() + ttl
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=product_id, quantity=quantities[product_id], expires_at=expires_at)
+            for product_id in tracked
+        ])
+
+
+def release_expired_reservations():
+    """Give the stock of expired reservations on unpaid orders back.
+
+    Returns the number of reservations released.
+    """
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.select_for_update()
+            .filter(status=StockReservation.HELD, expires_at__lte=timezone.now(), order__status=Order.PENDING)
+            .values_list('id', 'product_id', 'quantity')
+        )
+        returned = {}
+        for _id, product_id, quantity in expired:
+            returned[product_id] = returned.get(product_id, 0) + quantity
+        for product_id in sorted(returned):
+            Product.objects.filter(pk=product_id, stock__isnull=False).update(stock=F('stock') + returned[product_id])
+        StockReservation.objects.filter(id__in=[row[0] for row in expired]).update(status=StockReservation.RELEASED)
+    return len(expired)
+
+
+def prune_checkout_quotes():
+    """Delete expired quotes that never became an order.
+
+    Returns the number of quotes deleted.
+    """
+    deleted, _ = CheckoutQuote.objects.filter(order__isnull=True, expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,91 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cards import invalidate_product_card
+from .cart_store import merge_session_cart
+from .catalog import bump_catalog_generation
+from .images import delete_variants
+from .models import Category, Product
+from .search import index_product, unindex_product
+from .suggest import forget_product, refresh_product
+
+
+# Keep the full-text search and autocomplete indexes, and the catalog's
+# conditional-GET validator, in step with the catalog. The validator moves
+# only once the change has committed: a page rendered before then would
+# otherwise be served (and its facets cached) under the new generation. Every write path
+# (vendor add/edit/delete, admin approve/edit, Django admin) goes through
+# Product.save()/delete(), so these hooks see all of them.
+# Cached product cards need no hook on save: Product.save() bumps the version
+# they are keyed on. Category counters are moved by Product.save() itself and
+# by product_deleting/product_deleted below, inside the same transaction as
+# the row change.
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    index_product(instance)
+    refresh_product(instance)
+    transaction.on_commit(bump_catalog_generation)
+
+    previous = getattr(instance, '_loaded_image', None)
+    if getattr(instance, '_image_replaced', False) and previous:
+        _release_image(getattr(previous, 'name', previous))
+    instance._loaded_image = instance.image.name
+    instance._image_replaced = False
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    # read the row being deleted inside the delete's transaction, so a
+    # concurrent second delete of the same product finds nothing to count
+    instance._deleted_counts = (
+        Product.objects.select_for_update().filter(pk=instance.pk)
+        .values_list('category_id', 'is_approved').first()
+    )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+    forget_product(instance.pk)
+    invalidate_product_card(instance)
+    transaction.on_commit(bump_catalog_generation)
+    counts = getattr(instance, '_deleted_counts', None)
+    if counts is not None:
+        category, approved = counts
+        Category.adjust_counts(category, total=-1, approved=-int(bool(approved)))
+    if instance.image:
+        _release_image(instance.image.name)
+
+
+# Category names and sort order shape the catalog sections and facets.
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_generation)
+
+
+# Product images live in ContentAddressedStorage, which reference-counts each
+# stored file. A fresh upload takes a reference when it is saved; the image it
+# replaces, or the image of a deleted product, gives its reference back.
+@receiver(pre_save, sender=Product)
+def product_image_changing(sender, instance, **kwargs):
+    instance._image_replaced = bool(instance.image) and not instance.image._committed
+
+
+def _release_image(name):
+    def release():
+        storage = Product._meta.get_field('image').storage
+        storage.delete(name)
+        if not storage.exists(name):
+            delete_variants(name)
+
+    transaction.on_commit(release)
+
+
+# A cart filled before logging in follows the visitor into their account.
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request, user)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import re
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+# Names produced by ContentAddressedStorage (and files derived from them)
+# contain the full SHA-256 of the content, so they never change.
+DIGEST_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/(variants/)?[0-9a-f]{64}[^/]*$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that keeps one copy of each distinct upload.
+
+    An upload is hashed chunk by chunk and stored as
+    ``<upload_to>/<first two hex digits>/<sha256><ext>``. If that blob is
+    already on disk the write is skipped and only its reference count (a
+    StoredBlob row) goes up; delete() drops a reference and removes the file
+    when the last one goes. Files saved under other names before this storage
+    existed have no StoredBlob row and are never deleted by it.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        blob_name = '/'.join(filter(None, [directory, hexdigest[:2], hexdigest + ext]))
+
+        StoredBlob = apps.get_model('products', 'StoredBlob')
+        with transaction.atomic():
+            blob, _ = StoredBlob.objects.get_or_create(name=blob_name)
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+
+        if not self.exists(blob_name):
+            self._save(blob_name, content)
+        return blob_name
+
+    def delete(self, name):
+        StoredBlob = apps.get_model('products', 'StoredBlob')
+        with transaction.atomic():
+            if StoredBlob.objects.filter(name=name, refcount__gt=1).update(refcount=F('refcount') - 1):
+                return
+            removed, _ = StoredBlob.objects.filter(name=name).delete()
+        if removed:
+            super().delete(name)
+
+
+def product_image_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,136 @@
+import bisect
+import re
+import threading
+
+from django.db import transaction
+
+from .catalog import catalog_generation
+from .models import Product
+
+
+def _normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+class PrefixIndex:
+    """In-process autocomplete index over approved product names.
+
+    Every name is stored once per word it contains, as the suffix starting at
+    that word ("red wool scarf", "wool scarf", "scarf"), in one sorted list.
+    A lookup is a single bisect to the first key >= the prefix followed by a
+    short forward scan, so it never touches the database.
+
+    The index is per process. Each worker builds it on first use and records
+    the catalog generation it was built at; once the shared generation moves
+    on (a change committed by any process), the next lookup rebuilds it. The
+    worker's own saves and deletes are also applied as soon as they commit.
+    """
+
+    def __init__(self):
+        self._keys = []          # sorted (suffix, word_position, product_id)
+        self._entries = {}       # product_id -> list of keys
+        self._names = {}         # product_id -> display name
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.generation = None
+
+    def load(self, rows, generation=None):
+        """Rebuild the whole index from (product_id, name) pairs."""
+        keys, entries, names = [], {}, {}
+        for product_id, name in rows:
+            product_keys = self._keys_for(product_id, name)
+            keys.extend(product_keys)
+            entries[product_id] = product_keys
+            names[product_id] = name
+        keys.sort()
+        with self._lock:
+            self._keys, self._entries, self._names = keys, entries, names
+            self.loaded = True
+            self.generation = generation
+
+    def add(self, product_id, name):
+        with self._lock:
+            self._remove(product_id)
+            product_keys = self._keys_for(product_id, name)
+            for key in product_keys:
+                bisect.insort(self._keys, key)
+            self._entries[product_id] = product_keys
+            self._names[product_id] = name
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def search(self, prefix, limit=8):
+        """Return up to ``limit`` (product_id, name) pairs whose name has a word starting with ``prefix``.
+
+        Names that start with the prefix come before names that only contain it.
+        """
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            keys, names = self._keys, self._names
+            start = bisect.bisect_left(keys, (prefix,))
+            hits = {}
+            for suffix, position, product_id in keys[start:start + limit * 4]:
+                if not suffix.startswith(prefix):
+                    break
+                if product_id not in hits or position < hits[product_id]:
+                    hits[product_id] = position
+            ranked = sorted(hits.items(), key=lambda hit: (hit[1], names[hit[0]].lower()))
+            return [(product_id, names[product_id]) for product_id, _ in ranked[:limit]]
+
+    def _remove(self, product_id):
+        for key in self._entries.pop(product_id, []):
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+        self._names.pop(product_id, None)
+
+    @staticmethod
+    def _keys_for(product_id, name):
+        words = _normalize(name).split()
+        return [(' '.join(words[i:]), i, product_id) for i in range(len(words))]
+
+
+suggest_index = PrefixIndex()
+
+
+def get_suggest_index():
+    """Return the process-wide index, (re)building it from the database on
+    first use and whenever the catalog generation has changed since.
+
+    Checking costs one shared-cache read per lookup, never a database query.
+    """
+    # read before loading: a change committed during the load bumps it again
+    generation = catalog_generation()
+    if not suggest_index.loaded or suggest_index.generation != generation:
+        suggest_index.load(
+            Product.objects.filter(is_approved=True).values_list('id', 'name').iterator(),
+            generation=generation,
+        )
+    return suggest_index
+
+
+def refresh_product(product):
+    """Reflect a saved product in the index once the save commits (approved products only)."""
+    product_id, name, approved = product.pk, product.name, product.is_approved
+
+    def apply():
+        if not suggest_index.loaded:
+            return
+        if approved:
+            suggest_index.add(product_id, name)
+        else:
+            suggest_index.remove(product_id)
+
+    transaction.on_commit(apply)
+
+
+def forget_product(product_id):
+    def apply():
+        if suggest_index.loaded:
+            suggest_index.remove(product_id)
+
+    transaction.on_commit(apply)
@@ -0,0 +1,49 @@
+from django import template
+from django.utils.html import format_html
+
+from products.images import VARIANT_SIZES, variant_name
+
+register = template.Library()
+
+# For each display slot: the variants offered in srcset and the `sizes` hint
+PRESETS = {
+    'thumb': (('thumb', 'card'), '64px'),
+    'card': (('thumb', 'card'), '220px'),
+    'detail': (('card', 'detail'), '(max-width: 768px) 100vw, 600px'),
+}
+
+
+@register.simple_tag
+def product_picture(product, preset='card', css_class=''):
+    """Render a lazily loaded <picture> for a product image.
+
+    Serves WebP with a JPEG fallback at the sizes listed for ``preset``. Until
+    the variants exist, the original upload is used as before.
+    """
+    if product is None or not product.image:
+        return ''
+
+    if not product.image_variants:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            product.image.url, product.name, css_class,
+        )
+
+    sizes_used, sizes_attr = PRESETS[preset]
+    storage, name = product.image.storage, product.image.name
+
+    def srcset(ext):
+        return ', '.join(
+            f'{storage.url(variant_name(name, size, ext))} {VARIANT_SIZES[size]}w'
+            for size in sizes_used
+        )
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        srcset('webp'), sizes_attr,
+        storage.url(variant_name(name, sizes_used[-1], 'jpg')), srcset('jpg'), sizes_attr,
+        product.name, css_class,
+    )
@@ -1,3 +1,211 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.pagination import encode_cursor
+
+from .cart_store import CacheCartStore
+from .models import CartItem, Category, Order, Product, StockReservation
+from .services import OutOfStock, reserve_stock
+
+
+class StockReservationConcurrencyTests(TransactionTestCase):
+    """Many checkouts racing for the last units of one product."""
+
+    CHECKOUTS = 50
+    STOCK = 10
+
+    def setUp(self):
+        category = Category.objects.create(name='Stock test', slug='stock-test')
+        self.product = Product.objects.create(
+            name='Tote bag', image='products/tote.jpg', category=category,
+            price='500.00', stock=self.STOCK, is_approved=True,
+        )
+        self.buyers = [User.objects.create_user(f'buyer{i}') for i in range(self.CHECKOUTS)]
+
+    def _checkout(self, buyer, barrier, outcomes):
+        barrier.wait()
+        try:
+            # SQLite admits one writer at a time; a shopper whose request hit a
+            # locked database simply tries again, as the browser would
+            for _attempt in range(200):
+                try:
+                    with transaction.atomic():
+                        order = Order.objects.create(buyer=buyer, total_amount='500.00', payment_method='esewa')
+                        reserve_stock(order, [(self.product.pk, 1)])
+                    outcomes.append('reserved')
+                    return
+                except OutOfStock:
+                    outcomes.append('sold out')
+                    return
+                except OperationalError:
+                    time.sleep(0.005)
+            outcomes.append('gave up')
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_never_oversell(self):
+        barrier = threading.Barrier(self.CHECKOUTS)
+        outcomes = []
+        threads = [
+            threading.Thread(target=self._checkout, args=(buyer, barrier, outcomes))
+            for buyer in self.buyers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(outcomes.count('gave up'), 0)
+        self.assertEqual(outcomes.count('reserved'), self.STOCK)
+        self.assertEqual(outcomes.count('sold out'), self.CHECKOUTS - self.STOCK)
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(StockReservation.objects.filter(product=self.product).count(), self.STOCK)
+        # orders that could not reserve were rolled back with their reservation attempt
+        self.assertEqual(Order.objects.count(), self.STOCK)
+
+
+class ProductEditStockTests(TestCase):
+    """A product edit form left open while checkouts take stock."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Stock test', slug='stock-test')
+        self.product = Product.objects.create(
+            name='Tote bag', image='products/tote.jpg', category=category,
+            price='500.00', stock=10, is_approved=True,
+        )
+        self.buyer = User.objects.create_user('buyer')
+
+    def _reserve(self, quantity):
+        order = Order.objects.create(buyer=self.buyer, total_amount='500.00', payment_method='esewa')
+        reserve_stock(order, [(self.product.pk, quantity)])
+
+    def test_edit_keeps_stock_taken_after_the_form_was_loaded(self):
+        edited = Product.objects.get(pk=self.product.pk)
+        self._reserve(3)
+        edited.description = 'Now in green'
+        edited.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 7)
+
+    def test_edited_stock_is_applied_as_a_change(self):
+        edited = Product.objects.get(pk=self.product.pk)
+        self._reserve(3)
+        edited.stock = '15'  # the vendor restocked five units
+        edited.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 12)
+
+        edited = Product.objects.get(pk=self.product.pk)
+        self._reserve(10)
+        edited.stock = 0
+        edited.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 0)
+
+    def test_starting_and_stopping_tracking_sets_the_value(self):
+        edited = Product.objects.get(pk=self.product.pk)
+        edited.stock = None
+        edited.save()
+        self.assertIsNone(Product.objects.get(pk=self.product.pk).stock)
+        edited.stock = 4
+        edited.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 4)
+
+
+class CategoryCounterTests(TestCase):
+    """Category counters follow the rows actually replaced, not stale instances."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Counter test', slug='counter-test')
+        self.product = Product.objects.create(
+            name='Tote bag', image='products/tote.jpg', category=self.category, price='500.00',
+        )
+
+    def test_double_approval_counts_once(self):
+        first = Product.objects.get(pk=self.product.pk)
+        second = Product.objects.get(pk=self.product.pk)
+        for product in (first, second):
+            product.is_approved = True
+            product.save(update_fields=['is_approved'])
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.product_count, self.category.approved_count), (1, 1))
+
+    def test_double_delete_counts_once(self):
+        first = Product.objects.get(pk=self.product.pk)
+        second = Product.objects.get(pk=self.product.pk)
+        first.delete()
+        second.delete()
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.product_count, 0)
+
+
+class SearchCursorTests(TestCase):
+    """A search cursor that does not hold a (score, id) pair shows the first page."""
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        category = Category.objects.create(name='Search test', slug='search-test')
+        Product.objects.create(
+            name='Tote bag', image='products/tote.jpg', category=category, price='500.00', is_approved=True,
+        )
+        first = self.client.get('/products/search/', {'q': 'tote'})
+        for values in ([[1], {}], ['x', 1], [1.5, 'a'], [True, 2]):
+            with self.subTest(values=values):
+                response = self.client.get('/products/search/', {'q': 'tote', 'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, first.content)
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'carts': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cart-tests'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared-tests'},
+    },
+    CART_STORE='cache',
+    CART_LOCK_DIR=tempfile.mkdtemp(prefix='cart-locks-'),
+)
+class CacheCartStoreConcurrencyTests(TransactionTestCase):
+    """Parallel changes to one cached cart (double clicks, several tabs)."""
+
+    ADDS = 40
+
+    def setUp(self):
+        category = Category.objects.create(name='Cart test', slug='cart-test')
+        self.products = [
+            Product.objects.create(
+                name=f'Bag {i}', image='products/tote.jpg', category=category, price='500.00', is_approved=True,
+            )
+            for i in range(self.ADDS // 4)
+        ]
+        self.buyer = User.objects.create_user('buyer')
+
+    def test_parallel_adds_are_all_kept(self):
+        barrier = threading.Barrier(self.ADDS)
+
+        def add(product):
+            barrier.wait()
+            try:
+                CacheCartStore(self.buyer).add(product.pk, 1)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=add, args=(self.products[i % len(self.products)],))
+            for i in range(self.ADDS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        quantities = CacheCartStore(self.buyer).quantities()
+        self.assertEqual(quantities, {product.pk: 4 for product in self.products})
+
+        CacheCartStore(self.buyer).flush(release=True)
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart__user=self.buyer).values_list('product_id', 'quantity')),
+            quantities,
+        )
@@ -9,11 +9,15 @@ app_name = 'products'   # 🔴 REQUIRED
 urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('<int:product_id>/', views.product_detail, name='product_detail'),
+    path('category/<slug:slug>/', views.category_products, name='category_products'),
+    path('search/', views.search, name='search'),
+    path('suggest/', views.suggest, name='suggest'),
 
     path('cart/', views.cart_detail, name='cart'),
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
-    path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
-    path('cart/update/<int:item_id>/', views.update_cart, name='update_cart'),
+    path('cart/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/update/<int:product_id>/', views.update_cart, name='update_cart'),
+    path('cart/update/', views.update_cart_items, name='update_cart_items'),
 
     path('checkout/', views.checkout, name='checkout'),
     path('process-payment/<int:order_id>/', views.process_payment, name='process_payment'),
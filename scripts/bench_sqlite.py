@@ -0,0 +1,184 @@
+"""Compare SQLite throughput with and without the tuned connection profile.
+
+Runs the same mixed workload twice, each time in a fresh process on a
+throwaway copy of db.sqlite3:
+
+  baseline  rollback journal, deferred transactions, no PRAGMAs
+  tuned     settings as shipped when serving: WAL, synchronous=NORMAL
+            (SQLITE_SERVE_PRAGMAS), busy_timeout, mmap/cache/temp_store
+            PRAGMAs and BEGIN IMMEDIATE
+
+Readers page through the catalog and read a cart; writers run a
+checkout-shaped transaction (read the cart, upsert a cart line, create an
+order). Usage:
+
+    python scripts/bench_sqlite.py [--seconds 10] [--readers 8] [--writers 4]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'openbazar.settings')
+
+PROFILES = ('baseline', 'tuned')
+
+
+def run_profile(profile, seconds, readers, writers):
+    """Run the workload in this process and return its counters."""
+    workdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+    db_path = os.path.join(workdir, 'db.sqlite3')
+    shutil.copy(os.path.join(BASE_DIR, 'db.sqlite3'), db_path)
+
+    from openbazar import settings as project_settings
+    project_settings.DATABASES['default']['NAME'] = db_path
+    if profile == 'baseline':
+        project_settings.DATABASES['default']['OPTIONS'] = {}
+        project_settings.SQLITE_PRAGMAS = {}
+        project_settings.SQLITE_SERVE_PRAGMAS = {}
+        raw = sqlite3.connect(db_path)
+        raw.execute('PRAGMA journal_mode = delete')
+        raw.close()
+
+    import django
+    django.setup()
+
+    if profile == 'tuned':
+        # as openbazar/wsgi.py does, before the first connection is opened
+        from core.db import enable_serve_pragmas
+        enable_serve_pragmas()
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import OperationalError, connection, transaction
+
+    from products.models import CartItem, Order, Product
+
+    call_command('migrate', verbosity=0)
+    product_ids = list(Product.objects.filter(is_approved=True).values_list('id', flat=True)[:50])
+    if not product_ids:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise SystemExit('db.sqlite3 has no approved products to benchmark with')
+    users = [User.objects.get_or_create(username=f'bench-{i}')[0] for i in range(max(readers, writers))]
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+    connection.close()
+
+    stop = threading.Event()
+    start = threading.Barrier(readers + writers + 1)
+    lock = threading.Lock()
+    totals = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    write_latencies = []
+
+    def reader(user):
+        reads = errors = 0
+        start.wait()
+        try:
+            while not stop.is_set():
+                try:
+                    list(Product.objects.filter(is_approved=True).order_by('-id').values('id', 'name', 'price')[:24])
+                    list(CartItem.objects.filter(cart__user=user).values_list('product_id', 'quantity'))
+                    reads += 1
+                except OperationalError:
+                    errors += 1
+        finally:
+            connection.close()
+            with lock:
+                totals['reads'] += reads
+                totals['read_errors'] += errors
+
+    def writer(user, offset):
+        writes = errors = 0
+        latencies = []
+        start.wait()
+        try:
+            i = offset
+            while not stop.is_set():
+                began = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        lines = CartItem.objects.filter(cart__user=user).count()
+                        CartItem.objects.add_for_user(user, product_ids[i % len(product_ids)], 1)
+                        Order.objects.create(buyer=user, total_amount=lines, payment_method='cod')
+                    writes += 1
+                    latencies.append(time.perf_counter() - began)
+                except OperationalError:
+                    errors += 1
+                i += 1
+        finally:
+            connection.close()
+            with lock:
+                totals['writes'] += writes
+                totals['write_errors'] += errors
+                write_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader, args=(users[i],)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(users[i], i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    write_latencies.sort()
+    return {
+        'profile': profile,
+        'journal': f'{journal_mode}/{synchronous}',
+        'reads_per_sec': round(totals['reads'] / seconds, 1),
+        'writes_per_sec': round(totals['writes'] / seconds, 1),
+        'read_errors': totals['read_errors'],
+        'write_errors': totals['write_errors'],
+        'write_p50_ms': round(statistics.median(write_latencies) * 1000, 1) if write_latencies else None,
+        'write_p95_ms': round(write_latencies[int(len(write_latencies) * 0.95)] * 1000, 1) if write_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--profile', choices=PROFILES, help='run a single profile and print its result as JSON')
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.profile, args.seconds, args.readers, args.writers)))
+        return
+
+    # each profile runs in its own process so settings and connections start clean
+    results = []
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--profile', profile, '--seconds', str(args.seconds),
+             '--readers', str(args.readers), '--writers', str(args.writers)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    columns = (
+        'profile', 'journal', 'reads_per_sec', 'writes_per_sec',
+        'read_errors', 'write_errors', 'write_p50_ms', 'write_p95_ms',
+    )
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile')
+    print('  '.join(f'{column:>14}' for column in columns))
+    for result in results:
+        print('  '.join(f'{str(result[column]):>14}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+// ======================
+// PRODUCT AUTOCOMPLETE
+// ======================
+// Any <input data-suggest-url="..." list="..."> gets its <datalist> filled
+// with matching product names while the user types.
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll("input[data-suggest-url]").forEach(input => {
+    const list = document.getElementById(input.getAttribute("list"));
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => {
+        const q = input.value.trim();
+        if (!q) {
+          list.innerHTML = "";
+          return;
+        }
+        if (controller) controller.abort();
+        controller = new AbortController();
+
+        fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(q)}`, { signal: controller.signal })
+          .then(response => response.json())
+          .then(data => {
+            list.innerHTML = "";
+            data.results.forEach(result => {
+              const option = document.createElement("option");
+              option.value = result.name;
+              list.appendChild(option);
+            });
+          })
+          .catch(() => {});
+      }, 80);
+    });
+  });
+});
+
+// ======================
+// CART
+// ======================
+// The cart page (#cart-form) updates quantities and removes lines through the
+// JSON cart endpoints and patches the changed rows and totals in place, rather
+// than posting the form and re-rendering the whole page.
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.getElementById("cart-form");
+  if (!form) return;
+
+  const csrfToken = form.querySelector("input[name=csrfmiddlewaretoken]").value;
+  const totalItems = document.querySelector("[data-cart-total-items]");
+  const totalPrice = document.querySelector("[data-cart-total-price]");
+  let timer = null;
+
+  const send = (url, body) =>
+    fetch(url, {
+      method: "POST",
+      headers: {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "X-CSRFToken": csrfToken,
+      },
+      body: body ? JSON.stringify(body) : null,
+    }).then(response => {
+      if (!response.ok) throw new Error(response.statusText);
+      return response.json();
+    });
+
+  const apply = data => {
+    data.items.forEach(item => {
+      const row = form.querySelector(`[data-cart-item="${item.id}"]`);
+      if (!row) return;
+      row.querySelector(`input[name="quantity-${item.id}"]`).value = item.quantity;
+      row.querySelector(".line-total").textContent = `RS${item.total_price}`;
+    });
+    data.removed.forEach(id => {
+      const row = form.querySelector(`[data-cart-item="${id}"]`);
+      if (row) row.remove();
+    });
+    totalItems.textContent = data.total_items;
+    totalPrice.textContent = data.total_price;
+    if (!form.querySelector("[data-cart-item]")) window.location.reload();
+  };
+
+  // Fall back to a normal submit if the JSON request fails
+  const submitQuantities = () => {
+    const items = {};
+    form.querySelectorAll('input[name^="quantity-"]').forEach(input => {
+      if (input.value !== input.defaultValue) {
+        items[input.name.slice("quantity-".length)] = Number(input.value);
+        input.defaultValue = input.value;
+      }
+    });
+    if (!Object.keys(items).length) return;
+    send(form.action, { items }).then(apply).catch(() => form.submit());
+  };
+
+  form.addEventListener("submit", event => {
+    event.preventDefault();
+    clearTimeout(timer);
+    submitQuantities();
+  });
+
+  form.addEventListener("change", event => {
+    if (!event.target.name || !event.target.name.startsWith("quantity-")) return;
+    clearTimeout(timer);
+    timer = setTimeout(submitQuantities, 400);
+  });
+
+  form.querySelectorAll("[data-cart-remove]").forEach(link => {
+    link.addEventListener("click", event => {
+      event.preventDefault();
+      send(link.href).then(apply).catch(() => { window.location = link.href; });
+    });
+  });
+});
@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .models import Vendor
-from products.models import Order, OrderItem, Product  # Correct import
+from products.models import Category, Order, OrderItem, Product  # Correct import
 from .forms import VendorForm
 from django.contrib import messages
+from core.pagination import paginate
+from products.images import schedule_variants
+from products.services import InvalidTransition, transition_order
 
 @login_required
 def vendor_register(request):
@@ -58,19 +61,21 @@ def add_product(request):
         return redirect("vendors:dashboard")
 
     if request.method == "POST":
-        Product.objects.create(
+        product = Product.objects.create(
             vendor=vendor,
             name=request.POST.get("name"),
+            category=get_object_or_404(Category, name=request.POST.get("category")),
             price=request.POST.get("price"),
-            stock=request.POST.get("stock"),
+            stock=request.POST.get("stock") or None,
             description=request.POST.get("description"),
             image=request.FILES.get("image"),
         )
+        schedule_variants(product)
 
         messages.success(request, "Product added successfully!")
         return redirect("vendors:dashboard")
 
-    return render(request, "vendors/add_product.html")
+    return render(request, "vendors/add_product.html", {"categories": Category.objects.all()})
 
 @login_required
 def sell_now(request):
@@ -96,10 +101,13 @@ def sell_now(request):
 def vendor_orders(request):
     vendor = request.user.vendor_account
 
-    # Get all order items that belong to this vendor
-    order_items = OrderItem.objects.filter(vendor=vendor).select_related(
-        "order", "product", "order__buyer"
-    ).order_by('-order__created_at')  # optional: newest first
+    # Get all order items that belong to this vendor, newest first.
+    # Items are created together with their order, so id order follows order date.
+    order_items = paginate(
+        request,
+        OrderItem.objects.filter(vendor=vendor).select_related("order", "product", "order__buyer"),
+        ordering=("-id",),
+    )
 
     return render(request, "vendors/vendor_orders.html", {
         "order_items": order_items
@@ -115,9 +123,12 @@ def complete_order(request, order_id):
         messages.error(request, "You cannot approve this order.")
         return redirect("vendors:vendor_orders")
 
-    order.is_completed = True  # Mark complete
-    order.save()
-    messages.success(request, "Order marked as completed!")
+    try:
+        transition_order(order, Order.DELIVERED, by=request.user)  # Mark complete
+    except InvalidTransition:
+        messages.error(request, "Only paid orders can be marked as completed.")
+    else:
+        messages.success(request, "Order marked as completed!")
     return redirect("vendors:vendor_orders")
 
 @login_required
@@ -128,8 +139,10 @@ def complete_order_item(request, item_id):
 
     # Check if all items of the order are completed
     order = item.order
-    if not order.items.filter(is_completed=False).exists():
-        order.is_completed = True
-        order.save()
+    if order.can_move_to(Order.DELIVERED) and not order.items.filter(is_completed=False).exists():
+        try:
+            transition_order(order, Order.DELIVERED, by=request.user)
+        except InvalidTransition:
+            pass  # moved by someone else in the meantime
 
     return redirect("vendors:vendor_orders")